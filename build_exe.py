@@ -5,6 +5,70 @@ import os
 import sys
 import subprocess
 import shutil
+import hashlib
+from collections import deque
+
+# 未使用的PyQt5模块
+EXCLUDED_QT_MODULES = [
+    'PyQt5.QtQml', 'PyQt5.QtQuick', 'PyQt5.QtQuickWidgets', 'PyQt5.QtDesigner',
+    'PyQt5.QtHelp', 'PyQt5.QtMultimedia', 'PyQt5.QtMultimediaWidgets',
+    'PyQt5.QtWebEngine*', 'PyQt5.QtDBus', 'PyQt5.QtTest', 'PyQt5.QtBluetooth',
+    'PyQt5.QtPositioning', 'PyQt5.QtSensors', 'PyQt5.QtSerialPort',
+    'PyQt5.QtLocation', 'PyQt5.QtNfc', 'PyQt5.QtNetwork', 'PyQt5.QtPrintSupport',
+    'PyQt5.QtSvg',
+]
+
+# 不需要打包的DLL和数据文件
+EXCLUDED_DLLS = [
+    'opengl32sw.dll', 'd3dcompiler_47.dll', 'Qt5Qml*', 'Qt5Quick*',
+    'Qt5WebEngine*', 'Qt5Designer*', 'Qt5Multimedia*',
+]
+EXCLUDED_DATA_FILES = [
+    'PyQt5/Qt5/qml/**', 'PyQt5/Qt5/translations/**',
+]
+
+# 发布目录中的说明文件内容
+README_CONTENT = '音乐标签编辑器\n直接运行 音乐标签编辑器.exe 即可\n'.encode('utf-8')
+
+# 保留在项目目录中的Nuitka缓存（ccache、下载的工具等）
+NUITKA_CACHE_DIR = os.path.abspath('.nuitka-cache')
+
+
+def prepare_build_cache():
+    """依赖或Python版本变化时才清理build目录，否则复用上次的编译结果"""
+    key_source = sys.version.encode('utf-8')
+    try:
+        with open('requirements.txt', 'rb') as f:
+            key_source += f.read()
+    except FileNotFoundError:
+        pass
+    cache_key = hashlib.sha256(key_source).hexdigest()
+
+    key_path = os.path.join('build', '.cache_key')
+    try:
+        with open(key_path, 'r', encoding='utf-8') as f:
+            old_key = f.read().strip()
+    except FileNotFoundError:
+        old_key = None
+
+    if old_key != cache_key:
+        shutil.rmtree('build', ignore_errors=True)
+        os.makedirs('build', exist_ok=True)
+        with open(key_path, 'w', encoding='utf-8') as f:
+            f.write(cache_key)
+    else:
+        print("复用已有的构建缓存")
+
+
+def run_streaming(cmd, tail_lines=500):
+    """运行命令并实时输出，只保留最后若干行用于错误提示"""
+    tail = deque(maxlen=tail_lines)
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                          bufsize=1, text=True, errors='replace') as proc:
+        for line in proc.stdout:
+            sys.stdout.write(line)
+            tail.append(line)
+    return proc.returncode, tail
 
 
 def build_with_nuitka():
@@ -12,53 +76,72 @@ def build_with_nuitka():
 
     print("使用Nuitka构建（更快更稳定）...")
 
+    prepare_build_cache()
+    os.environ['NUITKA_CACHE_DIR'] = NUITKA_CACHE_DIR
+
     cmd = [
         sys.executable,  # 使用当前Python
         '-m', 'nuitka',
-        '--standalone',  # 独立程序
-        '--onefile',  # 单个文件
-        '--windows-disable-console',  # 无控制台
+        '--standalone',  # 独立程序（不用onefile，避免每次启动解压）
+        '--windows-console-mode=disable',  # 无控制台
+        '--lto=yes',  # 链接时优化
+        '--python-flag=no_docstrings,no_asserts',  # 相当于-OO
+        f'--jobs={os.cpu_count() or 1}',  # 并行编译C代码
         '--output-dir=build',  # 输出目录
         '--output-filename=音乐标签编辑器.exe',
         '--enable-plugin=pyqt5',  # PyQt5插件
-        '--include-package=mutagen',
-        '--include-package=beets',
-        '--include-module=utils',
-        '--include-module=tag_processor',
-        '--remove-output',  # 清理输出
+        '--noinclude-qt-translations',  # 不打包Qt翻译文件
+        # 程序只用到QtCore/QtGui/QtWidgets，排除其余PyQt5模块
+        '--nofollow-import-to=' + ','.join(EXCLUDED_QT_MODULES),
+        *[f'--noinclude-dlls={pattern}' for pattern in EXCLUDED_DLLS],
+        *[f'--noinclude-data-files={pattern}' for pattern in EXCLUDED_DATA_FILES],
+        '--nofollow-import-to=tkinter,numpy,matplotlib,unittest,test',
+        '--include-package=mutagen',  # 完整包含mutagen各格式模块
+        # beets按需导入dbcore、插件等子模块，并在运行时读取config_default.yaml，需要完整包含
+        '--include-package=beets',  # 包含beets.dbcore
+        '--include-package-data=beets',
+        '--include-package=mediafile',  # beets读写标签使用的独立包
         '--assume-yes-for-downloads',  # 自动下载
         'main.py'
     ]
 
+    # 有UPX时用LZMA压缩打包的DLL
+    upx_path = shutil.which('upx')
+    if upx_path:
+        os.environ['UPX'] = '--lzma --best'
+        cmd[-1:-1] = ['--enable-plugin=upx', f'--upx-binary={upx_path}']
+    else:
+        print("未找到UPX，跳过压缩")
+
     print(f"执行命令: {' '.join(cmd[2:])}")
 
     try:
         print("构建中，请稍候（大约2-5分钟）...")
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        returncode, output_tail = run_streaming(cmd)
 
-        if result.returncode == 0:
+        if returncode == 0:
             print("✅ Nuitka构建成功！")
 
             # 检查输出文件
-            exe_path = os.path.join('build', '音乐标签编辑器.exe')
+            dist_source = os.path.join('build', 'main.dist')
+            exe_path = os.path.join(dist_source, '音乐标签编辑器.exe')
             if os.path.exists(exe_path):
                 # 创建完整发布目录
-                if os.path.exists('dist'):
-                    shutil.rmtree('dist')
-
-                os.makedirs('dist', exist_ok=True)
+                shutil.rmtree('dist', ignore_errors=True)
 
-                # 复制可执行文件
-                shutil.copy2(exe_path, 'dist/音乐标签编辑器.exe')
+                # 复制整个standalone目录
+                shutil.copytree(dist_source, 'dist')
 
                 # 复制必要文件
                 for file in ['utils.py', 'tag_processor.py']:
-                    if os.path.exists(file):
+                    try:
                         shutil.copy2(file, 'dist/')
+                    except FileNotFoundError:
+                        pass
 
                 # 创建说明文件
-                with open('dist/说明.txt', 'w', encoding='utf-8') as f:
-                    f.write('音乐标签编辑器\n直接运行 音乐标签编辑器.exe 即可\n')
+                with open('dist/说明.txt', 'wb') as f:
+                    f.write(README_CONTENT)
 
                 print(f"✅ 程序已生成: dist/音乐标签编辑器.exe")
                 print(f"📦 文件大小: {os.path.getsize('dist/音乐标签编辑器.exe') / (1024 * 1024):.1f} MB")
@@ -69,8 +152,9 @@ def build_with_nuitka():
                 return False
         else:
             print(f"❌ Nuitka构建失败")
-            if result.stderr:
-                print("错误信息:", result.stderr[:500])
+            if output_tail:
+                print("错误信息:")
+                print(''.join(output_tail)[-2000:])
             return False
 
     except Exception as e:
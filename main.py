@@ -6,11 +6,14 @@ import sys
 import json
 import traceback
 import re
-from pathlib import Path
-from typing import List, Dict, Any, Optional
+import time
+import tempfile
+from typing import List, Dict
 from dataclasses import dataclass, field
 from enum import Enum
-import time
+from collections import Counter, OrderedDict
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 # PyQt5导入 - 设置环境变量避免警告
 import warnings
@@ -18,15 +21,14 @@ import warnings
 warnings.filterwarnings("ignore", category=DeprecationWarning)
 
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QLabel, QPushButton, QListWidget, QListWidgetItem, QCheckBox,
+                             QLabel, QPushButton, QListWidget, QCheckBox,
                              QGroupBox, QTextEdit, QLineEdit, QSpinBox, QComboBox,
-                             QDialog, QGridLayout, QScrollArea, QFrame, QMessageBox,
-                             QFileDialog, QTabWidget, QSplitter, QToolButton, QMenu,
-                             QAbstractItemView, QHeaderView, QTableWidget, QTableWidgetItem,
-                             QRadioButton, QButtonGroup, QProgressBar)
-from PyQt5.QtCore import Qt, pyqtSignal, QSize, QEvent, QTimer, QThread
-from PyQt5.QtGui import QFont, QIcon, QDragEnterEvent, QDropEvent
-from PyQt5.QtCore import QMimeData, QUrl
+                             QDialog, QGridLayout, QScrollArea, QMessageBox,
+                             QFileDialog, QTabWidget, QSplitter, QTableView, QListView,
+                             QRadioButton, QButtonGroup, QProgressBar, QStackedWidget)
+from PyQt5.QtCore import (Qt, pyqtSignal, QThread, QAbstractTableModel, QAbstractListModel,
+                          QModelIndex, QItemSelection, QItemSelectionModel)
+from PyQt5.QtGui import QFont, QDragEnterEvent, QDropEvent
 
 # 导入音频处理库
 try:
@@ -35,6 +37,7 @@ try:
     from mutagen.mp3 import MP3
     from mutagen.id3 import ID3
     from mutagen.wave import WAVE
+    from mutagen.dsf import DSF
     import mutagen.id3 as id3
 
     HAS_MUTAGEN = True
@@ -43,6 +46,10 @@ except ImportError:
     print("请先安装mutagen库: pip install mutagen")
     sys.exit(1)
 
+# 与tag_processor共用的公共函数
+from utils import (iter_file_entries, beets_available, get_beets, compile_bracket_pattern,
+                   PUNCTUATION_TABLES, MP3_FIELD_MAP, MP3_FIELD_MAP_INV)
+
 
 # 操作类型枚举
 class OperationType(Enum):
@@ -59,7 +66,7 @@ class OperationType(Enum):
     CONVERT_PUNCTUATION = "转换标点"
 
 
-@dataclass
+@dataclass(slots=True)
 class TagOperation:
     """标签操作类"""
     op_type: OperationType
@@ -73,6 +80,263 @@ class TagOperation:
     brackets: List[str] = field(default_factory=list)
     separator: str = ""  # 字段插入时的分隔符
     apply_to_all: bool = False  # 是否应用于所有字段
+    # 预编译的括号正则，由add_operation填充，不参与保存
+    bracket_pattern: re.Pattern = field(default=None, init=False, repr=False, compare=False)
+    # 单字符替换时预先生成的转换表，由add_operation填充，不参与保存
+    replace_table: dict = field(default=None, init=False, repr=False, compare=False)
+    # 标点转换方向对应的转换表，由add_operation填充，不参与保存
+    punctuation_table: dict = field(default=None, init=False, repr=False, compare=False)
+
+
+# 保存标签时至少保留的填充字节数
+TAG_PADDING = 4096
+
+# 读写DSF文件时的缓冲大小，减少慢速磁盘和网络路径上的小块读写
+FILE_BUFFER_SIZE = 64 * 1024
+
+
+def load_dsf(file_path: str):
+    """使用较大的缓冲区打开并解析DSF文件"""
+    with open(file_path, 'rb', buffering=FILE_BUFFER_SIZE) as f:
+        return DSF(f)
+
+
+def save_dsf(audio, file_path: str):
+    """使用较大的缓冲区保存DSF标签"""
+    with open(file_path, 'rb+', buffering=FILE_BUFFER_SIZE) as f:
+        audio.save(f, padding=keep_padding)
+
+
+def keep_padding(info):
+    """保存时至少保留TAG_PADDING字节的填充，标签变化不大时可以原地写入，不用重写整个文件"""
+    return max(info.padding, TAG_PADDING)
+
+
+def collapse_whitespace(value: str) -> str:
+    """把连续的空白字符合并为一个空格，结果与re.sub(r'\s+', ' ', value)相同"""
+    parts = value.split()
+    if not parts:
+        return ' ' if value else ''
+    result = ' '.join(parts)
+    # split会丢掉两端的空白，这里按原样补回一个空格
+    if value[0].isspace():
+        result = ' ' + result
+    if value[-1].isspace():
+        result += ' '
+    return result
+
+
+# 标签字段 -> beets字段
+BEETS_FIELD_MAP = {
+    'ARTIST': 'artist',
+    'TITLE': 'title',
+    'ALBUM': 'album',
+    'GENRE': 'genre',
+    'COMPOSER': 'composer',
+    'PERFORMER': 'performer',
+    'ALBUMARTIST': 'albumartist',
+    'DATE': 'year',
+    'TRACKNUMBER': 'track',
+    'TRACKTOTAL': 'tracktotal',
+    'DISCNUMBER': 'disc',
+    'TOTALDISCS': 'disctotal',
+    'COMMENT': 'comments'
+}
+
+# DSF字段映射（mutagen写入时使用的ID3帧）
+DSF_FIELD_MAP = {
+    'ARTIST': 'TPE1',
+    'TITLE': 'TIT2',
+    'ALBUM': 'TALB',
+    'DATE': 'TDRC',
+    'GENRE': 'TCON',
+    'TRACKNUMBER': 'TRCK',
+    'COMPOSER': 'TCOM',
+    'PERFORMER': 'TPE2',
+    'ALBUMARTIST': 'TPE2',
+    'COMMENT': 'COMM',
+    'DISCNUMBER': 'TPOS',
+}
+# 字段 -> ID3帧类，导入时查找一次
+DSF_FRAME_CLASSES = {field: getattr(id3, frame_id) for field, frame_id in DSF_FIELD_MAP.items()
+                     if hasattr(id3, frame_id)}
+# 只改这些字段时直接用mutagen写入；注释帧带语言和描述，PERFORMER和ALBUMARTIST共用TPE2，
+# DATE在beets中按年份处理，音轨号和碟号要和总数一起写入，这几个字段仍交给beets
+DSF_FAST_PATH_FIELDS = DSF_FRAME_CLASSES.keys() - {'COMMENT', 'PERFORMER', 'ALBUMARTIST', 'DATE',
+                                                   'TRACKNUMBER', 'DISCNUMBER'}
+# 字段 -> 帧的默认属性（encoding、lang、desc等），写入时只替换text
+DSF_FRAME_TEMPLATES = {field: vars(frame_class(encoding=3, text=''))
+                       for field, frame_class in DSF_FRAME_CLASSES.items()}
+
+
+def new_dsf_frame(field, value):
+    """按模板创建DSF字段对应的文本帧，跳过每次构造时的参数校验"""
+    frame_class = DSF_FRAME_CLASSES[field]
+    frame = frame_class.__new__(frame_class)
+    frame.__dict__.update(DSF_FRAME_TEMPLATES[field])
+    frame.text = [value]
+    return frame
+
+
+# ============================================================================
+# 标签操作处理函数
+# ============================================================================
+def _op_replace(operation, current_value, original_tags):
+    """替换文本"""
+    if operation.replace_table is not None:
+        return current_value.translate(operation.replace_table)
+    return current_value.replace(operation.old_text, operation.new_text)
+
+
+def _op_insert_text_prefix(operation, current_value, original_tags):
+    """插入文本前缀"""
+    return operation.text + current_value
+
+
+def _op_insert_text_suffix(operation, current_value, original_tags):
+    """插入文本后缀"""
+    return current_value + operation.text
+
+
+def _op_insert_field_prefix(operation, current_value, original_tags):
+    """插入字段前缀"""
+    source_value = original_tags.get(operation.source_field, "")
+    if source_value:
+        return source_value + operation.separator + current_value
+    return current_value
+
+
+def _op_insert_field_suffix(operation, current_value, original_tags):
+    """插入字段后缀"""
+    source_value = original_tags.get(operation.source_field, "")
+    if source_value:
+        return current_value + operation.separator + source_value
+    return current_value
+
+
+def _op_insert_field_position(operation, current_value, original_tags):
+    """插入字段到位置"""
+    source_value = original_tags.get(operation.source_field, "")
+    if not source_value:
+        return current_value
+    if operation.position <= len(current_value):
+        return (current_value[:operation.position] +
+                operation.separator + source_value +
+                current_value[operation.position:])
+    return current_value + operation.separator + source_value
+
+
+def _op_delete_range(operation, current_value, original_tags):
+    """删除范围"""
+    if operation.position < len(current_value):
+        end_pos = min(operation.position + operation.length, len(current_value))
+        return current_value[:operation.position] + current_value[end_pos:]
+    return current_value
+
+
+def _op_insert_position(operation, current_value, original_tags):
+    """插入到位置"""
+    if operation.position <= len(current_value):
+        return (current_value[:operation.position] +
+                operation.text +
+                current_value[operation.position:])
+    return current_value + operation.text
+
+
+def _op_remove_brackets(operation, current_value, original_tags):
+    """清除括号及内容"""
+    pattern = operation.bracket_pattern
+    if pattern is None:
+        pattern = compile_bracket_pattern(operation.brackets)
+        if pattern is None:
+            return current_value
+
+    # 所有括号一次扫描删除
+    return pattern.sub('', current_value)
+
+
+def _op_trim_spaces(operation, current_value, original_tags):
+    """修剪空格"""
+    if operation.new_text == "全部":
+        # 去掉两端后再合并，split/join一步完成
+        return ' '.join(current_value.split())
+
+    new_value = current_value
+    if operation.new_text == "两端空格":
+        new_value = new_value.strip()
+    elif operation.new_text == "重复空格":
+        new_value = collapse_whitespace(new_value)
+    return new_value
+
+
+def _op_convert_punctuation(operation, current_value, original_tags):
+    """转换标点"""
+    table = operation.punctuation_table
+    if table is None:
+        table = PUNCTUATION_TABLES.get(operation.new_text)
+    if table is None:
+        return current_value
+    return current_value.translate(table)
+
+
+# 操作类型 -> 处理函数
+OPERATION_HANDLERS = {
+    OperationType.REPLACE: _op_replace,
+    OperationType.INSERT_TEXT_PREFIX: _op_insert_text_prefix,
+    OperationType.INSERT_TEXT_SUFFIX: _op_insert_text_suffix,
+    OperationType.INSERT_FIELD_PREFIX: _op_insert_field_prefix,
+    OperationType.INSERT_FIELD_SUFFIX: _op_insert_field_suffix,
+    OperationType.INSERT_FIELD_POSITION: _op_insert_field_position,
+    OperationType.DELETE_RANGE: _op_delete_range,
+    OperationType.INSERT_POSITION: _op_insert_position,
+    OperationType.REMOVE_BRACKETS: _op_remove_brackets,
+    OperationType.TRIM_SPACES: _op_trim_spaces,
+    OperationType.CONVERT_PUNCTUATION: _op_convert_punctuation,
+}
+
+
+# ============================================================================
+# 子进程处理函数
+# ============================================================================
+# 支持的音频格式 (添加dsf)
+SUPPORTED_FORMATS = frozenset({'.flac', '.mp3', '.wav', '.m4a', '.aac', '.ogg', '.dsf'})
+
+# 去掉空格后的标准字段集合，扫描自定义字段时排除
+STANDARD_FIELD_KEYS = frozenset([
+    "ARTIST", "TITLE", "ALBUM", "GENRE", "COMPOSER",
+    "PERFORMER", "ALBUMARTIST", "DATE", "TRACKNUMBER",
+    "TRACKTOTAL", "DISCNUMBER", "TOTALDISCS", "COMMENT"
+])
+
+# 每个子进程内同时处理的文件数，mutagen保存文件时的IO会释放GIL，可以互相重叠
+WORKER_IO_THREADS = 4
+
+_worker_processor = None
+_worker_program = None
+_worker_io_pool = None
+
+
+def _init_worker(operations, selected_fields):
+    """子进程初始化，按传入的操作重建处理器并预先编译操作"""
+    global _worker_processor, _worker_program, _worker_io_pool
+    _worker_processor = MusicTagProcessor()
+    _worker_processor.operations = operations
+    _worker_program = _worker_processor.compile_operations(selected_fields)
+    _worker_io_pool = ThreadPoolExecutor(max_workers=WORKER_IO_THREADS)
+
+
+def _apply_one(file_path):
+    """处理单个文件，返回(文件路径, 错误信息)，成功时错误信息为空"""
+    try:
+        _worker_processor.apply_compiled(_worker_program, file_path)
+        return file_path, ""
+    except Exception as e:
+        return file_path, str(e)
+
+
+def _apply_worker(file_paths):
+    """在子进程中处理一组文件，组内文件的保存在IO线程中重叠进行"""
+    return list(_worker_io_pool.map(_apply_one, file_paths))
 
 
 # ============================================================================
@@ -84,6 +348,9 @@ class BatchProcessor(QThread):
     file_processed = pyqtSignal(str, bool, str)  # 文件路径，是否成功，错误信息
     batch_completed = pyqtSignal(int, int, list)  # 成功数，失败数，失败文件列表
 
+    # 每个子进程任务处理的文件数，分摊进程间通信开销，也是进度更新的粒度
+    CHUNK_SIZE = 16
+
     def __init__(self, processor, file_paths, selected_fields):
         super().__init__()
         self.processor = processor
@@ -97,31 +364,53 @@ class BatchProcessor(QThread):
         success_count = 0
         error_count = 0
         error_files = []
+        completed = 0
+
+        # 标签处理中的正则和字符串操作受GIL限制，用多进程并行处理，本线程只负责收集结果
+        # 先按扩展名分组再分块，同一块内的文件走相同的读写路径（例如DSF只在处理DSF的进程里加载beets）
+        files_by_ext = {}
+        for file_path in self.file_paths:
+            files_by_ext.setdefault(os.path.splitext(file_path)[1].lower(), []).append(file_path)
+        # 组内再按目录排列，每块尽量落在同一目录，各进程分别顺序读写不同目录
+        for paths in files_by_ext.values():
+            paths.sort(key=os.path.dirname)
+        chunks = [paths[i:i + self.CHUNK_SIZE]
+                  for paths in files_by_ext.values()
+                  for i in range(0, len(paths), self.CHUNK_SIZE)]
+        max_workers = max(1, min(len(chunks), os.cpu_count() or 1))
+
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(self.processor.operations, self.selected_fields)) as executor:
+            futures = {executor.submit(_apply_worker, chunk): chunk for chunk in chunks}
+
+            for future in as_completed(futures):
+                if self.cancel_requested:
+                    # 取消还未开始的任务，已在处理的文件会正常写完
+                    for pending in futures:
+                        pending.cancel()
+                    break
 
-        for i, file_path in enumerate(self.file_paths):
-            if self.cancel_requested:
-                break
-
-            try:
-                # 更新进度
-                self.progress_updated.emit(i + 1, self.total_files, os.path.basename(file_path))
-
-                # 处理文件
-                self.processor.apply_to_file(file_path, self.selected_fields)
-                success_count += 1
-                self.file_processed.emit(file_path, True, "")
-
-            except Exception as e:
-                error_count += 1
-                error_msg = str(e)
-                error_files.append(f"{os.path.basename(file_path)}: {error_msg}")
-                self.file_processed.emit(file_path, False, error_msg)
+                try:
+                    results = future.result()
+                except Exception as e:
+                    # 子进程异常退出，整组文件记为失败
+                    results = [(file_path, str(e)) for file_path in futures[future]]
+
+                for file_path, error_msg in results:
+                    completed += 1
+                    if not error_msg:
+                        success_count += 1
+                        self.file_processed.emit(file_path, True, "")
+                    else:
+                        error_count += 1
+                        error_files.append(f"{os.path.basename(file_path)}: {error_msg}")
+                        self.file_processed.emit(file_path, False, error_msg)
 
-                # 记录详细错误但不中断处理
-                print(f"处理文件失败 {file_path}: {error_msg}")
+                        # 记录详细错误但不中断处理
+                        print(f"处理文件失败 {file_path}: {error_msg}")
 
-            # 小延迟，避免过快处理导致界面卡顿
-            time.sleep(0.001)
+                # 更新进度
+                self.progress_updated.emit(completed, self.total_files, os.path.basename(file_path))
 
         # 发送完成信号
         if not self.cancel_requested:
@@ -137,8 +426,12 @@ class BatchProcessor(QThread):
 class CustomFieldScanner(QThread):
     """自定义字段扫描线程"""
     progress_updated = pyqtSignal(int, int, str)  # 当前进度，总数，当前文件名
+    partial_results = pyqtSignal(dict)  # 上次发送之后新增的字段统计
     scan_completed = pyqtSignal(dict)  # 字段统计字典
 
+    # 每扫描多少个文件发送一次进度和增量结果，避免信号过多导致界面卡顿
+    PROGRESS_INTERVAL = 16
+
     def __init__(self, file_paths):
         super().__init__()
         self.file_paths = file_paths[:50]  # 只扫描前50个文件，避免过长时间
@@ -147,46 +440,49 @@ class CustomFieldScanner(QThread):
 
     def run(self):
         """扫描自定义字段"""
-        standard_fields = [
-            "ARTIST", "TITLE", "ALBUM", "GENRE", "COMPOSER",
-            "PERFORMER", "ALBUMARTIST", "DATE", "TRACKNUMBER",
-            "TRACKTOTAL", "DISCNUMBER", "TOTALDISCS", "COMMENT"
-        ]
+        field_counts = Counter()
+        pending_counts = Counter()  # 还没有发送给界面的增量
 
-        field_counts = {}
-
-        for i, file_path in enumerate(self.file_paths):
+        # 最多只扫描50个文件，启动进程池的开销比读取本身还大，直接在本线程中逐个读取；
+        # map按需读取，取消后不会再读剩下的文件
+        results = map(self.scan_file, self.file_paths)
+        for i, (file_path, custom_fields) in enumerate(zip(self.file_paths, results)):
             if self.cancel_requested:
                 break
 
-            try:
-                # 更新进度
-                self.progress_updated.emit(i + 1, self.total_files, os.path.basename(file_path))
+            # 每个文件只计入增量，发送时再按字段合并到总数
+            pending_counts.update(custom_fields)
 
-                # 读取标签
-                tags = self.read_tags(file_path)
-                for field in tags.keys():
-                    field_upper = field.upper()
-                    is_standard = False
-                    for std_field in standard_fields:
-                        if field_upper.replace(" ", "") == std_field.replace(" ", ""):
-                            is_standard = True
-                            break
-
-                    if not is_standard:
-                        if field_upper not in field_counts:
-                            field_counts[field_upper] = 0
-                        field_counts[field_upper] += 1
-
-            except Exception as e:
-                print(f"扫描文件 {file_path} 失败: {e}")
-
-            time.sleep(0.001)
+            # 更新进度，同时发送增量结果
+            if i % self.PROGRESS_INTERVAL == 0:
+                self.progress_updated.emit(i + 1, self.total_files, os.path.basename(file_path))
+                if pending_counts:
+                    field_counts.update(pending_counts)
+                    self.partial_results.emit(dict(pending_counts))
+                    pending_counts.clear()
 
         if not self.cancel_requested:
-            self.scan_completed.emit(field_counts)
+            if pending_counts:
+                field_counts.update(pending_counts)
+                self.partial_results.emit(dict(pending_counts))
+            if self.file_paths:
+                self.progress_updated.emit(self.total_files, self.total_files,
+                                           os.path.basename(self.file_paths[-1]))
+            self.scan_completed.emit(dict(field_counts))
+
+    @staticmethod
+    def scan_file(file_path):
+        """读取单个文件，返回其中的自定义字段名列表"""
+        try:
+            tags = CustomFieldScanner.read_tags(file_path)
+            return [field_upper for field_upper in map(str.upper, tags)
+                    if field_upper.replace(" ", "") not in STANDARD_FIELD_KEYS]
+        except Exception as e:
+            print(f"扫描文件 {file_path} 失败: {e}")
+            return []
 
-    def read_tags(self, file_path):
+    @staticmethod
+    def read_tags(file_path):
         """读取文件标签"""
         try:
             ext = os.path.splitext(file_path)[1].lower()
@@ -198,24 +494,23 @@ class CustomFieldScanner(QThread):
                     for key, values in audio.tags.items():
                         key_upper = key.upper()
                         if values:
-                            tags[key_upper] = str(values[0])
+                            tags[key_upper] = values[0]
 
             elif ext == '.mp3':
                 audio = MP3(file_path, ID3=ID3)
                 tags = {}
                 if audio.tags:
                     for key in audio.tags.keys():
-                        if key.startswith('T'):
-                            tag_name = id3.ID3._get_frame_name(key)[0]
-                            if tag_name:
-                                text = str(audio.tags[key])
-                                if text:
-                                    tags[tag_name.upper()] = text
+                        tag_name = MP3_FIELD_MAP_INV.get(key[:4])
+                        if tag_name and tag_name not in tags:
+                            text = str(audio.tags[key])
+                            if text:
+                                tags[tag_name] = text
 
                     for frame in audio.tags.getall('TXXX'):
                         if hasattr(frame, 'desc') and hasattr(frame, 'text'):
                             field_name = frame.desc.upper()
-                            tags[field_name] = str(frame.text[0]) if frame.text else ""
+                            tags[field_name] = frame.text[0] if frame.text else ""
 
             elif ext == '.wav':
                 audio = WAVE(file_path)
@@ -230,33 +525,10 @@ class CustomFieldScanner(QThread):
                 tags = {}
                 # 尝试多种方法读取DSF标签
                 try:
-                    from beets.library import Library, Item
-                    from beets import config
-                    from beets.util import syspath
-
-                    config.clear()
-                    config.read(user=False)
-
-                    lib = Library(':memory:')
+                    Item, syspath = get_beets()
                     item = Item.from_path(syspath(file_path))
 
-                    field_mapping = {
-                        'artist': 'ARTIST',
-                        'title': 'TITLE',
-                        'album': 'ALBUM',
-                        'genre': 'GENRE',
-                        'composer': 'COMPOSER',
-                        'performer': 'PERFORMER',
-                        'albumartist': 'ALBUMARTIST',
-                        'year': 'DATE',
-                        'track': 'TRACKNUMBER',
-                        'tracktotal': 'TRACKTOTAL',
-                        'disc': 'DISCNUMBER',
-                        'disctotal': 'TOTALDISCS',
-                        'comments': 'COMMENT'
-                    }
-
-                    for beets_field, our_field in field_mapping.items():
+                    for our_field, beets_field in BEETS_FIELD_MAP.items():
                         try:
                             value = getattr(item, beets_field)
                             if value is not None:
@@ -266,18 +538,17 @@ class CustomFieldScanner(QThread):
 
                     # 尝试读取自定义字段
                     try:
-                        from mutagen.dsf import DSF
-                        audio = DSF(file_path)
+                        audio = load_dsf(file_path)
                         if audio and audio.tags:
                             # 查找TXXX帧（自定义字段）
-                            if 'TXXX' in audio.tags:
+                            if audio.tags.getall('TXXX'):  # 键带描述（TXXX:MOOD），不能直接用in判断
                                 txxx_frames = audio.tags.getall('TXXX')
                                 for frame in txxx_frames:
                                     if hasattr(frame, 'desc') and hasattr(frame, 'text'):
                                         field_name = frame.desc.upper()
-                                        if field_name and field_name not in field_mapping.values():
+                                        if field_name and field_name not in BEETS_FIELD_MAP:
                                             if hasattr(frame.text, '__len__') and len(frame.text) > 0:
-                                                tags[field_name] = str(frame.text[0])
+                                                tags[field_name] = frame.text[0]
                     except:
                         pass
 
@@ -312,6 +583,55 @@ class CustomFieldScanner(QThread):
         self.cancel_requested = True
 
 
+class FolderScanner(QThread):
+    """文件夹扫描线程，遍历目录不占用界面线程"""
+    progress_updated = pyqtSignal(int, int)  # 已扫描文件数，找到的音频文件数
+    files_found = pyqtSignal(list)  # 一批新找到的音频文件
+    scan_completed = pyqtSignal(int)  # 找到的音频文件总数
+
+    # 两次进度更新之间的最短间隔（秒），每秒最多约30次，和扫描速度无关
+    PROGRESS_INTERVAL = 0.033
+    # 每找到多少个音频文件发送一批，扫描过程中就能显示在列表里
+    BATCH_SIZE = 500
+
+    def __init__(self, folder):
+        super().__init__()
+        self.folder = folder
+        self.cancel_requested = False
+
+    def run(self):
+        """扫描文件夹"""
+        batch = []
+        found_files = 0
+        scanned_files = 0
+        last_emit = time.monotonic()
+
+        # 只遍历一次，不预先统计文件总数；scandir的条目自带类型信息，不需要额外stat
+        for entry in iter_file_entries(self.folder):
+            if self.cancel_requested:
+                break
+            if MusicTagEditor.is_supported_entry(entry):
+                batch.append(entry.path)
+                found_files += 1
+                if len(batch) >= self.BATCH_SIZE:
+                    self.files_found.emit(batch)
+                    batch = []
+
+            scanned_files += 1
+            now = time.monotonic()
+            if now - last_emit > self.PROGRESS_INTERVAL:
+                self.progress_updated.emit(scanned_files, found_files)
+                last_emit = now
+
+        if batch:
+            self.files_found.emit(batch)
+        self.scan_completed.emit(found_files)
+
+    def cancel(self):
+        """取消扫描"""
+        self.cancel_requested = True
+
+
 class MusicTagProcessor:
     """音乐标签处理器"""
 
@@ -320,224 +640,167 @@ class MusicTagProcessor:
 
     def add_operation(self, operation: TagOperation):
         """添加操作"""
+        if operation.op_type == OperationType.REMOVE_BRACKETS:
+            operation.bracket_pattern = compile_bracket_pattern(operation.brackets)
+        elif (operation.op_type == OperationType.REPLACE and
+              len(operation.old_text) == 1 and len(operation.new_text) == 1):
+            operation.replace_table = str.maketrans(operation.old_text, operation.new_text)
+        elif operation.op_type == OperationType.CONVERT_PUNCTUATION:
+            operation.punctuation_table = PUNCTUATION_TABLES.get(operation.new_text)
         self.operations.append(operation)
 
     def clear_operations(self):
         """清空所有操作"""
         self.operations.clear()
 
-    def preview_changes(self, original_tags: Dict[str, str], selected_fields: List[str]) -> Dict[str, str]:
-        """预览修改"""
-        modified_tags = original_tags.copy()
+    def compile_operations(self, selected_fields: List[str]):
+        """预先确定每个操作的处理函数和目标字段，返回(处理函数, 操作, 目标字段)列表，批量处理时只需计算一次"""
+        program = []
 
         for operation in self.operations:
             # 确定要操作的字段
             if operation.apply_to_all:
                 # 应用于所有选中的字段
-                target_fields = selected_fields
+                target_fields = tuple(selected_fields)
             else:
                 # 只应用于指定字段
-                target_fields = [operation.target_field] if operation.target_field in selected_fields else []
+                target_fields = (operation.target_field,) if operation.target_field in selected_fields else ()
 
-            for target_field in target_fields:
-                current_value = modified_tags.get(target_field, "")
-
-                # 根据操作类型处理
-                if operation.op_type == OperationType.REPLACE:
-                    new_value = current_value.replace(operation.old_text, operation.new_text)
-
-                elif operation.op_type == OperationType.INSERT_TEXT_PREFIX:
-                    new_value = operation.text + current_value
+            if target_fields:
+                program.append((OPERATION_HANDLERS[operation.op_type], operation, target_fields))
 
-                elif operation.op_type == OperationType.INSERT_TEXT_SUFFIX:
-                    new_value = current_value + operation.text
+        return program
 
-                elif operation.op_type == OperationType.INSERT_FIELD_PREFIX:
-                    source_value = original_tags.get(operation.source_field, "")
-                    if source_value:
-                        if operation.separator:
-                            new_value = source_value + operation.separator + current_value
-                        else:
-                            new_value = source_value + current_value
-                    else:
-                        new_value = current_value
-
-                elif operation.op_type == OperationType.INSERT_FIELD_SUFFIX:
-                    source_value = original_tags.get(operation.source_field, "")
-                    if source_value:
-                        if operation.separator:
-                            new_value = current_value + operation.separator + source_value
-                        else:
-                            new_value = current_value + source_value
-                    else:
-                        new_value = current_value
-
-                elif operation.op_type == OperationType.INSERT_FIELD_POSITION:
-                    source_value = original_tags.get(operation.source_field, "")
-                    if source_value:
-                        if operation.position <= len(current_value):
-                            if operation.separator:
-                                new_value = (current_value[:operation.position] +
-                                             operation.separator + source_value +
-                                             current_value[operation.position:])
-                            else:
-                                new_value = (current_value[:operation.position] +
-                                             source_value +
-                                             current_value[operation.position:])
-                        else:
-                            if operation.separator:
-                                new_value = current_value + operation.separator + source_value
-                            else:
-                                new_value = current_value + source_value
-                    else:
-                        new_value = current_value
-
-                elif operation.op_type == OperationType.DELETE_RANGE:
-                    if operation.position < len(current_value):
-                        end_pos = min(operation.position + operation.length, len(current_value))
-                        new_value = current_value[:operation.position] + current_value[end_pos:]
-                    else:
-                        new_value = current_value
-
-                elif operation.op_type == OperationType.INSERT_POSITION:
-                    if operation.position <= len(current_value):
-                        new_value = (current_value[:operation.position] +
-                                     operation.text +
-                                     current_value[operation.position:])
-                    else:
-                        new_value = current_value + operation.text
-
-                elif operation.op_type == OperationType.REMOVE_BRACKETS:
-                    new_value = current_value
-                    for brackets in operation.brackets:
-                        if len(brackets) == 2:
-                            open_bracket, close_bracket = brackets[0], brackets[1]
-                            # 使用正则表达式删除括号及内容
-                            pattern = re.escape(open_bracket) + '.*?' + re.escape(close_bracket)
-                            new_value = re.sub(pattern, '', new_value)
-
-                elif operation.op_type == OperationType.TRIM_SPACES:
-                    new_value = current_value
-                    if operation.new_text in ["两端空格", "全部"]:
-                        new_value = new_value.strip()
-                    if operation.new_text in ["重复空格", "全部"]:
-                        new_value = re.sub(r'\s+', ' ', new_value)
-
-                elif operation.op_type == OperationType.CONVERT_PUNCTUATION:
-                    new_value = current_value
-                    if operation.new_text == "中文转英文":
-                        # 中文标点转英文标点
-                        chinese_punctuation = '，。！？；："‘’""（）【】《》'
-                        english_punctuation = ',.!?;:\'""""()[]<>'
-                        trans_table = str.maketrans(chinese_punctuation, english_punctuation)
-                        new_value = new_value.translate(trans_table)
-                    elif operation.new_text == "英文转中文":
-                        # 英文标点转中文标点
-                        english_punctuation = ',.!?;:\'""""()[]<>'
-                        chinese_punctuation = '，。！？；："‘’""（）【】《》'
-                        trans_table = str.maketrans(english_punctuation, chinese_punctuation)
-                        new_value = new_value.translate(trans_table)
-
-                else:
-                    new_value = current_value
+    def run_program(self, program, original_tags: Dict[str, str]) -> Dict[str, str]:
+        """按编译好的操作计算新标签"""
+        modified_tags = original_tags.copy()
 
-                modified_tags[target_field] = new_value
+        for handler, operation, target_fields in program:
+            for target_field in target_fields:
+                current_value = modified_tags.get(target_field, "")
+                modified_tags[target_field] = handler(operation, current_value, original_tags)
 
         return modified_tags
 
+    def preview_changes(self, original_tags: Dict[str, str], selected_fields: List[str]) -> Dict[str, str]:
+        """预览修改"""
+        return self.run_program(self.compile_operations(selected_fields), original_tags)
+
     def apply_to_file(self, file_path: str, selected_fields: List[str]):
         """应用到文件"""
-        # 读取原始标签
-        original_tags = self.read_file_tags(file_path)
+        self.apply_compiled(self.compile_operations(selected_fields), file_path)
+
+    def apply_compiled(self, program, file_path: str):
+        """按编译好的操作处理单个文件"""
+        # 扩展名只计算一次，读取和写入共用
+        ext = os.path.splitext(file_path)[1].lower()
+
+        # 读取原始标签，文件只打开一次，写入时复用同一个音频对象
+        read_error = None
+        try:
+            audio, original_tags = self._open_audio(file_path, ext)
+        except Exception as e:
+            print(f"读取标签失败 {file_path}: {e}")
+            audio, original_tags, read_error = None, {}, e
 
         # 计算新标签
-        new_tags = self.preview_changes(original_tags, selected_fields)
+        new_tags = self.run_program(program, original_tags)
+
+        # 读取失败又没有要写入的内容时，按读取失败处理
+        if read_error is not None and all(value == "" for value in new_tags.values()):
+            raise read_error
 
         # 写入文件
-        self.write_file_tags(file_path, original_tags, new_tags)
+        self.write_file_tags(file_path, original_tags, new_tags, audio, ext)
 
     def read_file_tags(self, file_path: str) -> Dict[str, str]:
         """读取文件标签"""
         try:
-            ext = os.path.splitext(file_path)[1].lower()
-
-            if ext == '.flac':
-                audio = FLAC(file_path)
-                tags = {}
-                if audio.tags:
-                    for key, values in audio.tags.items():
-                        key_upper = key.upper()
-                        if values:
-                            tags[key_upper] = str(values[0])
-
-            elif ext == '.mp3':
-                audio = MP3(file_path, ID3=ID3)
-                tags = {}
-                if audio.tags:
-                    for key in audio.tags.keys():
-                        if key.startswith('T'):
-                            tag_name = id3.ID3._get_frame_name(key)[0]
-                            if tag_name:
-                                text = str(audio.tags[key])
-                                if text:
-                                    tags[tag_name.upper()] = text
-
-                    # 处理自定义字段 (TXXX)
-                    for frame in audio.tags.getall('TXXX'):
-                        if hasattr(frame, 'desc') and hasattr(frame, 'text'):
-                            field_name = frame.desc.upper()
-                            tags[field_name] = str(frame.text[0]) if frame.text else ""
-
-            elif ext == '.wav':
-                audio = WAVE(file_path)
-                tags = {}
-                if audio.tags:
-                    for key, values in audio.tags.items():
-                        key_upper = key.upper()
-                        if values:
-                            tags[key_upper] = str(values[0])
+            return self._open_audio(file_path)[1]
+        except Exception as e:
+            print(f"读取标签失败 {file_path}: {e}")
+            return {}
 
-            elif ext == '.dsf':
-                # DSF文件处理 - 优先使用beets
-                tags = self._read_dsf_tags_beets(file_path)
-                if not tags:
-                    # 回退到mutagen
-                    tags = self._read_dsf_tags_mutagen(file_path)
+    def _open_audio(self, file_path: str, ext: str = None):
+        """打开文件并读取标签，返回(音频对象, 标签字典)，ext为小写扩展名，为None时从路径获取"""
+        if ext is None:
+            ext = os.path.splitext(file_path)[1].lower()
 
-                # 尝试读取自定义字段
-                custom_tags = self._read_dsf_custom_tags(file_path)
-                if custom_tags:
-                    tags.update(custom_tags)
+        if ext == '.flac':
+            audio = FLAC(file_path)
+            tags = {}
+            if audio.tags:
+                for key, values in audio.tags.items():
+                    key_upper = key.upper()
+                    if values:
+                        tags[key_upper] = values[0]
+
+        elif ext == '.mp3':
+            audio = MP3(file_path, ID3=ID3)
+            tags = {}
+            if audio.tags:
+                # 只遍历一次所有帧
+                for frame in audio.tags.values():
+                    frame_id = frame.FrameID
+                    if frame_id == 'TXXX':
+                        # 处理自定义字段 (TXXX)
+                        tags[frame.desc.upper()] = frame.text[0] if frame.text else ""
+                    elif frame_id.startswith('T') or frame_id == 'COMM':
+                        tag_name = MP3_FIELD_MAP_INV.get(frame_id)
+                        # 有多个注释帧时只取第一个
+                        if tag_name and tag_name not in tags:
+                            text = str(frame)
+                            if text:
+                                tags[tag_name] = text
+
+        elif ext == '.wav':
+            audio = WAVE(file_path)
+            tags = {}
+            if audio.tags:
+                for key, values in audio.tags.items():
+                    key_upper = key.upper()
+                    if values:
+                        tags[key_upper] = str(values[0])
+
+        elif ext == '.dsf':
+            # mutagen的DSF对象只打开一次，供回退读取、自定义字段和写入共用
+            audio = self._open_dsf(file_path)
+
+            # DSF文件处理 - 优先使用beets
+            tags = self._read_dsf_tags_beets(file_path)
+            if not tags:
+                # 回退到mutagen
+                tags = self._read_dsf_tags_mutagen(audio)
+
+            # 尝试读取自定义字段
+            custom_tags = self._read_dsf_custom_tags(file_path, audio)
+            if custom_tags:
+                tags.update(custom_tags)
 
-            else:
-                # 其他格式
-                audio = mutagen.File(file_path, easy=True)
-                tags = {}
-                if audio:
-                    for key, values in audio.items():
-                        key_upper = key.upper()
-                        if values:
-                            tags[key_upper] = str(values[0])
+        else:
+            # 其他格式
+            audio = mutagen.File(file_path, easy=True)
+            tags = {}
+            if audio:
+                for key, values in audio.items():
+                    key_upper = key.upper()
+                    if values:
+                        tags[key_upper] = str(values[0])
 
-            return tags
+        return audio, tags
 
+    def _open_dsf(self, file_path: str):
+        """使用mutagen打开DSF文件，失败时返回None"""
+        try:
+            return load_dsf(file_path)
         except Exception as e:
-            print(f"读取标签失败 {file_path}: {e}")
-            return {}
+            print(f"mutagen读取DSF失败 {file_path}: {e}")
+            return None
 
     def _read_dsf_tags_beets(self, file_path: str) -> Dict[str, str]:
         """使用beets库读取DSF标签"""
         try:
-            from beets.library import Library, Item
-            from beets import config
-            from beets.util import syspath
-
-            # 创建临时配置
-            config.clear()
-            config.read(user=False)
-
-            # 创建内存中的库
-            lib = Library(':memory:')
+            Item, syspath = get_beets()
 
             # 使用beets的Item类读取文件
             item = Item.from_path(syspath(file_path))
@@ -545,24 +808,7 @@ class MusicTagProcessor:
             # 从item获取标签
             tags = {}
 
-            # 字段映射
-            field_mapping = {
-                'artist': 'ARTIST',
-                'title': 'TITLE',
-                'album': 'ALBUM',
-                'genre': 'GENRE',
-                'composer': 'COMPOSER',
-                'performer': 'PERFORMER',
-                'albumartist': 'ALBUMARTIST',
-                'year': 'DATE',
-                'track': 'TRACKNUMBER',
-                'tracktotal': 'TRACKTOTAL',
-                'disc': 'DISCNUMBER',
-                'disctotal': 'TOTALDISCS',
-                'comments': 'COMMENT'
-            }
-
-            for beets_field, our_field in field_mapping.items():
+            for our_field, beets_field in BEETS_FIELD_MAP.items():
                 try:
                     value = getattr(item, beets_field)
                     if value is not None:
@@ -576,27 +822,15 @@ class MusicTagProcessor:
             print(f"beets读取DSF失败 {file_path}: {e}")
             return {}
 
-    def _read_dsf_tags_mutagen(self, file_path: str) -> Dict[str, str]:
+    def _read_dsf_tags_mutagen(self, audio) -> Dict[str, str]:
         """使用mutagen读取DSF标签"""
-        try:
-            audio = mutagen.File(file_path, easy=True)
-            if audio:
-                return {k.upper(): str(v[0]) if v else "" for k, v in audio.items()}
-            return {}
-        except Exception as e:
-            print(f"mutagen读取DSF失败 {file_path}: {e}")
-            return {}
+        if audio:
+            return {k.upper(): str(v[0]) if v else "" for k, v in audio.items()}
+        return {}
 
-    def _read_dsf_custom_tags(self, file_path: str) -> Dict[str, str]:
+    def _read_dsf_custom_tags(self, file_path: str, audio) -> Dict[str, str]:
         """读取DSF自定义字段"""
         try:
-            # 尝试使用mutagen的DSF模块
-            try:
-                from mutagen.dsf import DSF
-                audio = DSF(file_path)
-            except ImportError:
-                return {}
-
             if not audio or not audio.tags:
                 return {}
 
@@ -611,43 +845,32 @@ class MusicTagProcessor:
 
             try:
                 # 处理TXXX帧（自定义字段）
-                if 'TXXX' in audio.tags:
+                if audio.tags.getall('TXXX'):  # 键带描述（TXXX:MOOD），不能直接用in判断
                     txxx_frames = audio.tags.getall('TXXX')
                     for frame in txxx_frames:
                         if hasattr(frame, 'desc') and hasattr(frame, 'text'):
                             field_name = frame.desc.upper()
                             if field_name and field_name not in standard_fields:
                                 if hasattr(frame.text, '__len__') and len(frame.text) > 0:
-                                    tags[field_name] = str(frame.text[0])
+                                    tags[field_name] = frame.text[0]
                                 else:
                                     tags[field_name] = str(frame.text) if frame.text else ""
 
                 # 遍历所有帧，查找其他自定义字段
+                # 跳过已处理的TXXX和已知的标准帧
+                standard_frames = ['TXXX', 'TIT2', 'TPE1', 'TALB', 'TCON', 'TCOM',
+                                   'TPE2', 'TDRC', 'TRCK', 'TPOS', 'COMM']
                 for frame_id in list(audio.tags.keys()):
-                    if frame_id == 'TXXX':
-                        continue
-
-                    # 跳过已知的标准帧
-                    standard_frames = ['TIT2', 'TPE1', 'TALB', 'TCON', 'TCOM',
-                                       'TPE2', 'TDRC', 'TRCK', 'TPOS', 'COMM']
-                    if frame_id in standard_frames:
-                        continue
-
                     # 尝试获取帧内容
                     try:
                         frame = audio.tags[frame_id]
+                        # 按帧ID判断，TXXX和COMM的键带描述（如TXXX:MOOD、COMM::eng）
+                        if frame.FrameID in standard_frames:
+                            continue
                         if hasattr(frame, 'text'):
                             text_value = str(frame.text[0]) if hasattr(frame.text, '__len__') else str(frame.text)
                             if text_value:
-                                # 尝试获取可读的帧名
-                                try:
-                                    frame_name = id3.ID3._get_frame_name(frame_id)[0]
-                                    if frame_name:
-                                        tags[frame_name.upper()] = text_value
-                                    else:
-                                        tags[frame_id] = text_value
-                                except:
-                                    tags[frame_id] = text_value
+                                tags[frame.FrameID] = text_value
                     except:
                         pass
 
@@ -660,128 +883,119 @@ class MusicTagProcessor:
             print(f"读取DSF自定义字段失败 {file_path}: {e}")
             return {}
 
-    def write_file_tags(self, file_path: str, original_tags: Dict[str, str], new_tags: Dict[str, str]):
-        """写入文件标签"""
+    def write_file_tags(self, file_path: str, original_tags: Dict[str, str], new_tags: Dict[str, str],
+                        audio=None, ext: str = None):
+        """写入文件标签，audio为读取时已打开的音频对象，为None时重新打开文件；ext为小写扩展名，为None时从路径获取"""
+        # 只处理有变化的字段，没有变化时不打开也不保存文件
+        changed_tags = {field: value for field, value in new_tags.items() if value != original_tags.get(field, "")}
+        if not changed_tags:
+            return
+
         try:
-            ext = os.path.splitext(file_path)[1].lower()
+            if ext is None:
+                ext = os.path.splitext(file_path)[1].lower()
 
             if ext == '.flac':
-                audio = FLAC(file_path)
+                if audio is None:
+                    audio = FLAC(file_path)
+                if audio.tags is None:
+                    audio.add_tags()
 
-                for field, value in new_tags.items():
-                    if value != original_tags.get(field, ""):
-                        if value:
-                            audio[field] = [value]
-                        elif field in audio:
-                            del audio[field]
+                # 一次性去掉所有要修改的字段（字段名不区分大小写），再追加新值
+                changed_keys = {field.upper() for field in changed_tags}
+                audio.tags[:] = [(key, value) for key, value in audio.tags if key.upper() not in changed_keys]
+                audio.tags.extend((field, value) for field, value in changed_tags.items() if value)
 
-                audio.save()
+                audio.save(padding=keep_padding)
 
             elif ext == '.mp3':
-                audio = MP3(file_path, ID3=ID3)
+                if audio is None:
+                    audio = MP3(file_path, ID3=ID3)
 
                 # 确保有ID3标签
                 if audio.tags is None:
                     audio.add_tags()
 
-                # MP3字段映射
-                mp3_field_map = {
-                    'ARTIST': 'TPE1',
-                    'TITLE': 'TIT2',
-                    'ALBUM': 'TALB',
-                    'GENRE': 'TCON',
-                    'COMPOSER': 'TCOM',
-                    'PERFORMER': 'TPE2',
-                    'ALBUMARTIST': 'TPE2',
-                    'DATE': 'TDRC',
-                    'TRACKNUMBER': 'TRCK',
-                    'TRACKTOTAL': 'TRCK',
-                    'DISCNUMBER': 'TPOS',
-                    'COMMENT': 'COMM',
-                }
+                # 先收集要删除的帧和新帧，最后统一修改
+                removed_frame_ids = set()
+                removed_descs = set()  # 自定义字段 (TXXX) 的描述
+                new_frames = []
 
-                for field, value in new_tags.items():
-                    if value != original_tags.get(field, ""):
-                        mp3_field = mp3_field_map.get(field)
-                        if mp3_field:
-                            if value:
-                                # 特殊处理TRACKNUMBER和TRACKTOTAL
-                                if field == 'TRACKNUMBER':
-                                    tracktotal = new_tags.get('TRACKTOTAL', '')
-                                    if tracktotal:
-                                        value = f"{value}/{tracktotal}"
-                                elif field == 'TRACKTOTAL':
-                                    continue
+                for field, value in changed_tags.items():
+                    mp3_field = MP3_FIELD_MAP.get(field)
+                    if mp3_field:
+                        if value:
+                            # 特殊处理TRACKNUMBER和TRACKTOTAL
+                            if field == 'TRACKNUMBER':
+                                tracktotal = new_tags.get('TRACKTOTAL', '')
+                                if tracktotal:
+                                    value = f"{value}/{tracktotal}"
+                            elif field == 'TRACKTOTAL':
+                                continue
+
+                            # 特殊处理DISCNUMBER
+                            if field == 'DISCNUMBER':
+                                totaldiscs = new_tags.get('TOTALDISCS', '')
+                                if totaldiscs:
+                                    value = f"{value}/{totaldiscs}"
+                            elif field == 'TOTALDISCS':
+                                continue
+
+                            # 创建或更新帧
+                            frame_class = getattr(id3, mp3_field, None)
+                            if frame_class:
+                                removed_frame_ids.add(mp3_field)
+                                new_frames.append(frame_class(encoding=3, text=value))
+                        else:
+                            removed_frame_ids.add(mp3_field)
+                    else:
+                        # 自定义字段 (TXXX)，读取时描述统一转成大写，删除时也不区分大小写
+                        removed_descs.add(field.upper())
+                        if value:
+                            new_frames.append(id3.TXXX(encoding=3, desc=field, text=value))
 
-                                # 特殊处理DISCNUMBER
-                                if field == 'DISCNUMBER':
-                                    totaldiscs = new_tags.get('TOTALDISCS', '')
-                                    if totaldiscs:
-                                        value = f"{value}/{totaldiscs}"
-                                elif field == 'TOTALDISCS':
-                                    continue
+                # 删除现有的帧
+                for frame_id in removed_frame_ids:
+                    audio.tags.delall(frame_id)
+                if removed_descs:
+                    audio.tags.setall('TXXX', [frame for frame in audio.tags.getall('TXXX')
+                                               if frame.desc.upper() not in removed_descs])
 
-                                # 创建或更新帧
-                                frame_class = getattr(id3, mp3_field, None)
-                                if frame_class:
-                                    # 删除现有的帧
-                                    if mp3_field in audio.tags:
-                                        del audio.tags[mp3_field]
-                                    audio.tags.add(frame_class(encoding=3, text=value))
-                            elif mp3_field in audio.tags:
-                                del audio.tags[mp3_field]
-                        else:
-                            # 自定义字段 (TXXX)
-                            if value:
-                                # 删除现有的相同字段
-                                frames_to_remove = []
-                                for frame in audio.tags.getall('TXXX'):
-                                    if hasattr(frame, 'desc') and frame.desc == field:
-                                        frames_to_remove.append(frame)
-                                for frame in frames_to_remove:
-                                    audio.tags.remove(frame)
-
-                                audio.tags.add(id3.TXXX(encoding=3, desc=field, text=value))
-                            else:
-                                # 删除字段
-                                frames_to_remove = []
-                                for frame in audio.tags.getall('TXXX'):
-                                    if hasattr(frame, 'desc') and frame.desc == field:
-                                        frames_to_remove.append(frame)
-                                for frame in frames_to_remove:
-                                    audio.tags.remove(frame)
-
-                audio.save()
+                # 添加新帧
+                for frame in new_frames:
+                    audio.tags.add(frame)
+
+                audio.save(v2_version=4, padding=keep_padding)
 
             elif ext == '.wav':
-                audio = WAVE(file_path)
+                if audio is None:
+                    audio = WAVE(file_path)
 
                 if audio.tags is None:
                     pass
                 else:
-                    for field, value in new_tags.items():
-                        if value != original_tags.get(field, ""):
-                            if value:
-                                audio[field] = [value]
-                            elif field in audio:
-                                del audio[field]
+                    for field, value in changed_tags.items():
+                        if value:
+                            audio[field] = [value]
+                        elif field in audio:
+                            del audio[field]
 
-                    audio.save()
+                    audio.save(padding=keep_padding)
 
             elif ext == '.dsf':
                 # DSF文件写入
-                self._write_dsf_tags(file_path, original_tags, new_tags)
+                self._write_dsf_tags(file_path, changed_tags, new_tags, audio)
 
             else:
                 # 其他格式
-                audio = mutagen.File(file_path, easy=True)
+                if audio is None:
+                    audio = mutagen.File(file_path, easy=True)
                 if audio:
-                    for field, value in new_tags.items():
-                        if value != original_tags.get(field, ""):
-                            if value:
-                                audio[field.lower()] = value
-                            elif field.lower() in audio:
-                                del audio[field.lower()]
+                    for field, value in changed_tags.items():
+                        if value:
+                            audio[field.lower()] = value
+                        elif field.lower() in audio:
+                            del audio[field.lower()]
 
                     audio.save()
 
@@ -789,110 +1003,99 @@ class MusicTagProcessor:
             print(f"写入标签失败 {file_path}: {e}")
             raise
 
-    def _write_dsf_tags(self, file_path: str, original_tags: Dict[str, str], new_tags: Dict[str, str]):
-        """写入DSF文件标签"""
+    def _write_dsf_tags(self, file_path: str, changed_tags: Dict[str, str], new_tags: Dict[str, str], audio=None):
+        """写入DSF文件标签，changed_tags为write_file_tags中算好的有变化的字段"""
+        # 标准字段和自定义字段用集合运算拆分
+        changed_standard = changed_tags.keys() & BEETS_FIELD_MAP.keys()
+        changed_custom = changed_tags.keys() - BEETS_FIELD_MAP.keys()
+        # 只改了mutagen能直接写的文本帧时不需要beets，省去一次导入和解析
+        use_beets = beets_available() and not changed_tags.keys() <= DSF_FAST_PATH_FIELDS
+
         try:
             # 首先尝试使用beets
-            try:
-                from beets.library import Library, Item
-                from beets import config
-                from beets.util import syspath
-
-                config.clear()
-                config.read(user=False)
-
-                item = Item.from_path(syspath(file_path))
-
-                field_mapping = {
-                    'ARTIST': 'artist',
-                    'TITLE': 'title',
-                    'ALBUM': 'album',
-                    'GENRE': 'genre',
-                    'COMPOSER': 'composer',
-                    'PERFORMER': 'performer',
-                    'ALBUMARTIST': 'albumartist',
-                    'DATE': 'year',
-                    'TRACKNUMBER': 'track',
-                    'TRACKTOTAL': 'tracktotal',
-                    'DISCNUMBER': 'disc',
-                    'TOTALDISCS': 'disctotal',
-                    'COMMENT': 'comments'
-                }
+            if use_beets:
+                try:
+                    Item, syspath = get_beets()
 
-                for our_field, beets_field in field_mapping.items():
-                    if our_field in new_tags and new_tags[our_field] != original_tags.get(our_field, ""):
-                        value = new_tags[our_field]
+                    item = Item.from_path(syspath(file_path))
+                    dirty = bool(changed_standard)
+
+                    for our_field in changed_standard:
+                        value = changed_tags[our_field]
                         if value:
-                            setattr(item, beets_field, value)
+                            setattr(item, BEETS_FIELD_MAP[our_field], value)
                         else:
-                            setattr(item, beets_field, None)
+                            setattr(item, BEETS_FIELD_MAP[our_field], None)
 
-                # 写入自定义字段
-                for field, value in new_tags.items():
-                    if field not in field_mapping and value != original_tags.get(field, ""):
+                    # 写入自定义字段
+                    for field in changed_custom:
+                        value = changed_tags[field]
                         if value:
                             try:
                                 # 尝试存储自定义字段
                                 item['_' + field.lower()] = value
+                                dirty = True
                             except:
                                 pass
 
-                item.write()
-                return
+                    # 没有实际修改时不重写文件
+                    if dirty:
+                        item.write()
+                    return
 
-            except Exception as beets_error:
-                print(f"beets写入DSF失败 {file_path}: {beets_error}")
+                except Exception as beets_error:
+                    print(f"beets写入DSF失败 {file_path}: {beets_error}")
 
             # 如果beets失败，尝试使用mutagen
             try:
-                from mutagen.dsf import DSF
-                audio = DSF(file_path)
+                if audio is None:
+                    audio = load_dsf(file_path)
 
                 if audio.tags is None:
                     audio.add_tags()
 
-                # DSF字段映射
-                dsf_field_map = {
-                    'ARTIST': 'TPE1',
-                    'TITLE': 'TIT2',
-                    'ALBUM': 'TALB',
-                    'DATE': 'TDRC',
-                    'GENRE': 'TCON',
-                    'TRACKNUMBER': 'TRCK',
-                    'COMPOSER': 'TCOM',
-                    'PERFORMER': 'TPE2',
-                    'ALBUMARTIST': 'TPE2',
-                    'COMMENT': 'COMM',
-                    'DISCNUMBER': 'TPOS',
-                }
-
-                for field, value in new_tags.items():
-                    if value != original_tags.get(field, ""):
-                        dsf_field = dsf_field_map.get(field)
-                        if dsf_field:
-                            if value:
-                                # 特殊处理TRACKNUMBER和TRACKTOTAL
-                                if field == 'TRACKNUMBER':
-                                    tracktotal = new_tags.get('TRACKTOTAL', '')
-                                    if tracktotal:
-                                        value = f"{value}/{tracktotal}"
-                                elif field == 'TRACKTOTAL':
+                dirty = False
+                for field, value in changed_tags.items():
+                    dsf_field = DSF_FIELD_MAP.get(field)
+                    if dsf_field:
+                        if value:
+                            # 音轨号和碟号带上总数写入，beets没有总数时读出的是"0"，按没有处理
+                            if field == 'TRACKNUMBER':
+                                tracktotal = new_tags.get('TRACKTOTAL', '')
+                                if tracktotal not in ('', '0'):
+                                    value = f"{value}/{tracktotal}"
+                            elif field == 'DISCNUMBER':
+                                totaldiscs = new_tags.get('TOTALDISCS', '')
+                                if totaldiscs not in ('', '0'):
+                                    value = f"{value}/{totaldiscs}"
+
+                            # 创建或更新帧，内容相同的帧保持不动
+                            frame_class = DSF_FRAME_CLASSES.get(field)
+                            if frame_class:
+                                # 按帧ID查找，COMM的键带语言和描述（如COMM::eng）
+                                existing = audio.tags.getall(dsf_field)
+                                if len(existing) == 1 and list(map(str, existing[0].text)) == [value]:
                                     continue
+                                audio.tags.delall(dsf_field)
+                                audio.tags.add(new_dsf_frame(field, value))
+                                dirty = True
+                        elif audio.tags.getall(dsf_field):
+                            audio.tags.delall(dsf_field)
+                            dirty = True
+                    else:
+                        # 自定义字段，描述不区分大小写
+                        frames = audio.tags.getall('TXXX')
+                        kept = [frame for frame in frames if frame.desc.upper() != field]
+                        if len(kept) != len(frames):
+                            audio.tags.setall('TXXX', kept)
+                            dirty = True
+                        if value:
+                            audio.tags.add(id3.TXXX(encoding=3, desc=field, text=value))
+                            dirty = True
 
-                                # 创建或更新帧
-                                frame_class = getattr(id3, dsf_field, None)
-                                if frame_class:
-                                    if dsf_field in audio.tags:
-                                        del audio.tags[dsf_field]
-                                    audio.tags.add(frame_class(encoding=3, text=value))
-                            elif dsf_field in audio.tags:
-                                del audio.tags[dsf_field]
-                        else:
-                            # 自定义字段
-                            if value:
-                                audio.tags.add(id3.TXXX(encoding=3, desc=field, text=value))
-
-                audio.save()
+                # 所有帧都和原来相同时不保存，避免重写DSF元数据块
+                if dirty:
+                    save_dsf(audio, file_path)
 
             except Exception as mutagen_error:
                 print(f"mutagen写入DSF失败 {file_path}: {mutagen_error}")
@@ -905,26 +1108,30 @@ class DropFileWidget(QWidget):
     """支持拖放文件的Widget"""
     files_dropped = pyqtSignal(list)
 
+    # 提示标签的样式，所有实例共用同一个字符串
+    LABEL_QSS = """
+        QLabel#dropLabel {
+            border: 2px dashed #aaa;
+            border-radius: 10px;
+            padding: 30px;
+            font-size: 14px;
+            color: #666;
+        }
+        QLabel#dropLabel:hover {
+            border-color: #0078d7;
+            color: #0078d7;
+        }
+    """
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAcceptDrops(True)
 
         layout = QVBoxLayout(self)
         self.label = QLabel("拖拽文件或文件夹到这里")
+        self.label.setObjectName("dropLabel")
         self.label.setAlignment(Qt.AlignCenter)
-        self.label.setStyleSheet("""
-            QLabel {
-                border: 2px dashed #aaa;
-                border-radius: 10px;
-                padding: 30px;
-                font-size: 14px;
-                color: #666;
-            }
-            QLabel:hover {
-                border-color: #0078d7;
-                color: #0078d7;
-            }
-        """)
+        self.label.setStyleSheet(self.LABEL_QSS)
         layout.addWidget(self.label)
 
     def dragEnterEvent(self, event: QDragEnterEvent):
@@ -1021,9 +1228,12 @@ class AddOperationDialog(QDialog):
         layout.addWidget(self.source_group)
         self.source_group.hide()
 
-        # 参数设置
+        # 参数设置：每种操作一页，切换操作类型时只切换页面
         self.params_group = QGroupBox("参数设置")
-        self.params_layout = QGridLayout(self.params_group)
+        params_layout = QVBoxLayout(self.params_group)
+        self.params_stack = QStackedWidget()
+        params_layout.addWidget(self.params_stack)
+        self.setup_param_pages()
         layout.addWidget(self.params_group)
 
         # 按钮
@@ -1039,6 +1249,87 @@ class AddOperationDialog(QDialog):
 
         self.on_op_type_changed(self.op_type_combo.currentText())
 
+    def add_param_page(self, *op_types):
+        """添加一页参数控件，返回该页的网格布局"""
+        page = QWidget()
+        page_layout = QGridLayout(page)
+        page_layout.setColumnStretch(1, 1)
+        index = self.params_stack.addWidget(page)
+        for op_type in op_types:
+            self.param_page_index[op_type] = index
+        return page_layout
+
+    def setup_param_pages(self):
+        """一次性创建所有操作类型的参数页"""
+        self.param_page_index = {}
+
+        # 没有参数的操作使用空白页
+        self.add_param_page()
+
+        page_layout = self.add_param_page("替换文本")
+        page_layout.addWidget(QLabel("查找文本:"), 0, 0)
+        self.old_text_edit = QLineEdit()
+        page_layout.addWidget(self.old_text_edit, 0, 1)
+        page_layout.addWidget(QLabel("替换为:"), 1, 0)
+        self.new_text_edit = QLineEdit()
+        page_layout.addWidget(self.new_text_edit, 1, 1)
+
+        page_layout = self.add_param_page("插入文本前缀", "插入文本后缀")
+        page_layout.addWidget(QLabel("插入文本:"), 0, 0)
+        self.text_edit = QLineEdit()
+        page_layout.addWidget(self.text_edit, 0, 1)
+
+        page_layout = self.add_param_page("删除范围")
+        page_layout.addWidget(QLabel("起始位置:"), 0, 0)
+        self.start_spin = QSpinBox()
+        self.start_spin.setMinimum(1)
+        self.start_spin.setMaximum(1000)
+        self.start_spin.setValue(1)
+        page_layout.addWidget(self.start_spin, 0, 1)
+        page_layout.addWidget(QLabel("删除长度:"), 1, 0)
+        self.length_spin = QSpinBox()
+        self.length_spin.setMinimum(1)
+        self.length_spin.setMaximum(1000)
+        self.length_spin.setValue(1)
+        page_layout.addWidget(self.length_spin, 1, 1)
+
+        page_layout = self.add_param_page("插入到位置")
+        page_layout.addWidget(QLabel("插入位置:"), 0, 0)
+        self.pos_spin = QSpinBox()
+        self.pos_spin.setMinimum(1)
+        self.pos_spin.setMaximum(1000)
+        self.pos_spin.setValue(1)
+        page_layout.addWidget(self.pos_spin, 0, 1)
+        page_layout.addWidget(QLabel("插入文本:"), 1, 0)
+        self.pos_text_edit = QLineEdit()
+        page_layout.addWidget(self.pos_text_edit, 1, 1)
+
+        page_layout = self.add_param_page("清除括号内容")
+        bracket_layout = QHBoxLayout()
+        self.bracket_vars = {}
+        label = QLabel("选择括号类型:")
+        bracket_layout.addWidget(label)
+        for bracket in ["()", "[]", "{}"]:
+            cb = QCheckBox(bracket)
+            if bracket == "()":
+                cb.setChecked(True)
+            self.bracket_vars[bracket] = cb
+            bracket_layout.addWidget(cb)
+        bracket_layout.addStretch()
+        page_layout.addLayout(bracket_layout, 0, 0, 1, 2)
+
+        page_layout = self.add_param_page("转换标点符号")
+        page_layout.addWidget(QLabel("转换方向:"), 0, 0)
+        self.direction_combo = QComboBox()
+        self.direction_combo.addItems(["中文转英文", "英文转中文"])
+        page_layout.addWidget(self.direction_combo, 0, 1)
+
+        page_layout = self.add_param_page("修剪空格")
+        page_layout.addWidget(QLabel("操作:"), 0, 0)
+        self.trim_combo = QComboBox()
+        self.trim_combo.addItems(["两端空格", "重复空格", "全部"])
+        page_layout.addWidget(self.trim_combo, 0, 1)
+
     def on_op_type_changed(self, op_type):
         """操作类型变化"""
         if op_type in ["插入字段前缀", "插入字段后缀", "插入字段到位置"]:
@@ -1046,87 +1337,7 @@ class AddOperationDialog(QDialog):
         else:
             self.source_group.hide()
 
-        self.clear_params()
-
-        if op_type == "替换文本":
-            self.params_layout.addWidget(QLabel("查找文本:"), 0, 0)
-            self.old_text_edit = QLineEdit()
-            self.params_layout.addWidget(self.old_text_edit, 0, 1)
-            self.params_layout.addWidget(QLabel("替换为:"), 1, 0)
-            self.new_text_edit = QLineEdit()
-            self.params_layout.addWidget(self.new_text_edit, 1, 1)
-
-        elif op_type in ["插入文本前缀", "插入文本后缀"]:
-            self.params_layout.addWidget(QLabel("插入文本:"), 0, 0)
-            self.text_edit = QLineEdit()
-            self.params_layout.addWidget(self.text_edit, 0, 1)
-
-        elif op_type == "删除范围":
-            self.params_layout.addWidget(QLabel("起始位置:"), 0, 0)
-            self.start_spin = QSpinBox()
-            self.start_spin.setMinimum(1)
-            self.start_spin.setMaximum(1000)
-            self.start_spin.setValue(1)
-            self.params_layout.addWidget(self.start_spin, 0, 1)
-            self.params_layout.addWidget(QLabel("删除长度:"), 1, 0)
-            self.length_spin = QSpinBox()
-            self.length_spin.setMinimum(1)
-            self.length_spin.setMaximum(1000)
-            self.length_spin.setValue(1)
-            self.params_layout.addWidget(self.length_spin, 1, 1)
-
-        elif op_type == "插入到位置":
-            self.params_layout.addWidget(QLabel("插入位置:"), 0, 0)
-            self.pos_spin = QSpinBox()
-            self.pos_spin.setMinimum(1)
-            self.pos_spin.setMaximum(1000)
-            self.pos_spin.setValue(1)
-            self.params_layout.addWidget(self.pos_spin, 0, 1)
-            self.params_layout.addWidget(QLabel("插入文本:"), 1, 0)
-            self.text_edit = QLineEdit()
-            self.params_layout.addWidget(self.text_edit, 1, 1)
-
-        elif op_type == "清除括号内容":
-            bracket_layout = QHBoxLayout()
-            self.bracket_vars = {}
-            label = QLabel("选择括号类型:")
-            bracket_layout.addWidget(label)
-            for bracket in ["()", "[]", "{}"]:
-                cb = QCheckBox(bracket)
-                if bracket == "()":
-                    cb.setChecked(True)
-                self.bracket_vars[bracket] = cb
-                bracket_layout.addWidget(cb)
-            bracket_layout.addStretch()
-            bracket_widget = QWidget()
-            bracket_widget.setLayout(bracket_layout)
-            self.params_layout.addWidget(bracket_widget, 0, 0, 1, 2)
-
-        elif op_type == "转换标点符号":
-            self.params_layout.addWidget(QLabel("转换方向:"), 0, 0)
-            self.direction_combo = QComboBox()
-            self.direction_combo.addItems(["中文转英文", "英文转中文"])
-            self.params_layout.addWidget(self.direction_combo, 0, 1)
-
-        elif op_type == "修剪空格":
-            self.params_layout.addWidget(QLabel("操作:"), 0, 0)
-            self.trim_combo = QComboBox()
-            self.trim_combo.addItems(["两端空格", "重复空格", "全部"])
-            self.params_layout.addWidget(self.trim_combo, 0, 1)
-
-        self.params_layout.setColumnStretch(1, 1)
-
-    def clear_params(self):
-        """清除参数区域"""
-        for i in reversed(range(self.params_layout.count())):
-            widget = self.params_layout.itemAt(i).widget()
-            if widget:
-                widget.hide()
-
-        while self.params_layout.count():
-            item = self.params_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
+        self.params_stack.setCurrentIndex(self.param_page_index.get(op_type, 0))
 
     def on_ok(self):
         """确定按钮"""
@@ -1179,7 +1390,7 @@ class AddOperationDialog(QDialog):
 
             elif op_type == OperationType.INSERT_POSITION:
                 operation.position = self.pos_spin.value() - 1
-                operation.text = self.text_edit.text()
+                operation.text = self.pos_text_edit.text()
 
             elif op_type == OperationType.REMOVE_BRACKETS:
                 operation.brackets = []
@@ -1237,6 +1448,90 @@ class ProcessingDialog(QDialog):
         self.label.setText(f"正在处理: {filename}\n({current}/{total})")
 
 
+class CustomFieldModel(QAbstractTableModel):
+    """自定义字段表格模型：字段名（可勾选）和包含的文件数"""
+
+    HEADERS = ["字段名", "包含的文件数"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.fields = []  # [字段名, 文件数, 是否勾选]
+        self.row_of_field = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.fields)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        field, count, checked = self.fields[index.row()]
+        if role == Qt.DisplayRole:
+            return field if index.column() == 0 else str(count)
+        if role == Qt.CheckStateRole and index.column() == 0:
+            return Qt.Checked if checked else Qt.Unchecked
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if role == Qt.CheckStateRole and index.isValid() and index.column() == 0:
+            self.fields[index.row()][2] = value == Qt.Checked
+            self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+            return True
+        return False
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() == 0:
+            flags |= Qt.ItemIsUserCheckable
+        return flags
+
+    def add_counts(self, field_counts):
+        """合并一批字段统计，已有字段累加数量，新字段一次性插入到末尾"""
+        new_fields = []
+        for field, count in field_counts.items():
+            row = self.row_of_field.get(field)
+            if row is None:
+                new_fields.append(field)
+            else:
+                self.fields[row][1] += count
+                count_index = self.index(row, 1)
+                self.dataChanged.emit(count_index, count_index, [Qt.DisplayRole])
+
+        if new_fields:
+            first = len(self.fields)
+            self.beginInsertRows(QModelIndex(), first, first + len(new_fields) - 1)
+            for field in new_fields:
+                self.row_of_field[field] = len(self.fields)
+                # 新发现的字段默认勾选
+                self.fields.append([field, field_counts[field], True])
+            self.endInsertRows()
+
+    def sort_by_count(self):
+        """按文件数从多到少排序"""
+        self.layoutAboutToBeChanged.emit()
+        self.fields.sort(key=lambda row: row[1], reverse=True)
+        self.row_of_field = {row[0]: i for i, row in enumerate(self.fields)}
+        self.layoutChanged.emit()
+
+    def set_all_checked(self, checked):
+        """全部勾选或全部取消"""
+        for row in self.fields:
+            row[2] = checked
+        if self.fields:
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.fields) - 1, 0), [Qt.CheckStateRole])
+
+    def checked_fields(self):
+        """获取勾选的字段"""
+        return [field for field, count, checked in self.fields if checked]
+
+
 class CustomFieldDialog(QDialog):
     """自定义字段扫描对话框"""
 
@@ -1249,6 +1544,7 @@ class CustomFieldDialog(QDialog):
         # 使用线程扫描
         self.scanner = CustomFieldScanner(file_paths)
         self.scanner.progress_updated.connect(self.on_scan_progress)
+        self.scanner.partial_results.connect(self.field_model.add_counts)
         self.scanner.scan_completed.connect(self.on_scan_completed)
         self.scanner.start()
 
@@ -1263,9 +1559,10 @@ class CustomFieldDialog(QDialog):
         self.progress_bar = QProgressBar()
         layout.addWidget(self.progress_bar)
 
-        self.field_table = QTableWidget()
-        self.field_table.setColumnCount(2)
-        self.field_table.setHorizontalHeaderLabels(["字段名", "包含的文件数"])
+        # 扫描过程中逐批加入字段，勾选状态直接存在模型里
+        self.field_model = CustomFieldModel(self)
+        self.field_table = QTableView()
+        self.field_table.setModel(self.field_model)
         self.field_table.horizontalHeader().setStretchLastSection(True)
         layout.addWidget(self.field_table)
 
@@ -1300,16 +1597,9 @@ class CustomFieldDialog(QDialog):
 
     def on_scan_completed(self, field_counts):
         """扫描完成"""
-        sorted_fields = sorted(field_counts.items(), key=lambda x: x[1], reverse=True)
-        self.field_table.setRowCount(len(sorted_fields))
-        self.custom_fields = []
-
-        for i, (field, count) in enumerate(sorted_fields):
-            checkbox = QCheckBox(field)
-            checkbox.setChecked(True)
-            self.custom_fields.append(field)
-            self.field_table.setCellWidget(i, 0, checkbox)
-            self.field_table.setItem(i, 1, QTableWidgetItem(str(count)))
+        # 字段已经通过增量结果加入表格，这里只需要排序
+        self.field_model.sort_by_count()
+        self.custom_fields = [row[0] for row in self.field_model.fields]
 
         # 隐藏进度条，显示表格
         self.progress_label.hide()
@@ -1322,26 +1612,15 @@ class CustomFieldDialog(QDialog):
 
     def select_all(self):
         """全选"""
-        for i in range(self.field_table.rowCount()):
-            checkbox = self.field_table.cellWidget(i, 0)
-            if checkbox:
-                checkbox.setChecked(True)
+        self.field_model.set_all_checked(True)
 
     def select_none(self):
         """全不选"""
-        for i in range(self.field_table.rowCount()):
-            checkbox = self.field_table.cellWidget(i, 0)
-            if checkbox:
-                checkbox.setChecked(False)
+        self.field_model.set_all_checked(False)
 
     def get_selected_fields(self):
         """获取选中的字段"""
-        selected = []
-        for i in range(self.field_table.rowCount()):
-            checkbox = self.field_table.cellWidget(i, 0)
-            if checkbox and checkbox.isChecked():
-                selected.append(checkbox.text())
-        return selected
+        return self.field_model.checked_fields()
 
     def reject(self):
         """取消扫描"""
@@ -1349,23 +1628,79 @@ class CustomFieldDialog(QDialog):
         super().reject()
 
 
+class FileListModel(QAbstractListModel):
+    """文件列表模型：显示文件名，提示显示完整路径，视图只为可见行取数据"""
+
+    def __init__(self, file_list, parent=None):
+        super().__init__(parent)
+        self.file_list = file_list  # 与主窗口共用同一个列表
+        # 文件名在加入时计算一次，重绘时直接取用
+        self.file_names = [os.path.basename(file_path) for file_path in file_list]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.file_list)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            # 对于大量文件，只显示文件名以提高性能
+            return self.file_names[index.row()]
+        if role == Qt.ToolTipRole:
+            return self.file_list[index.row()]  # 显示完整路径
+        return None
+
+    def append_files(self, file_paths):
+        """在末尾追加文件，只通知新增的行"""
+        if not file_paths:
+            return
+        first = len(self.file_list)
+        self.beginInsertRows(QModelIndex(), first, first + len(file_paths) - 1)
+        self.file_list.extend(file_paths)
+        self.file_names.extend(map(os.path.basename, file_paths))
+        self.endInsertRows()
+
+    def clear_files(self):
+        """清空文件列表"""
+        self.beginResetModel()
+        self.file_list.clear()
+        self.file_names.clear()
+        self.endResetModel()
+
+    def refresh(self):
+        """文件列表在外部被整体修改后刷新视图"""
+        self.beginResetModel()
+        self.file_names = [os.path.basename(file_path) for file_path in self.file_list]
+        self.endResetModel()
+
+
 class MusicTagEditor(QMainWindow):
     """音乐标签编辑器主窗口"""
 
+    # 预览标签缓存最多保存的文件数
+    TAG_CACHE_SIZE = 2000
+
     def __init__(self):
         super().__init__()
 
         # 初始化变量
         self.file_list = []
+        self.file_set = set()  # 与file_list内容相同，用于快速判断重复
         self.selected_files = []
         self.custom_fields = []
         self.tag_processor = MusicTagProcessor()
         self.current_preview = {}
+        # 文件路径 -> ((修改时间, 大小), 标签)，按最近使用排序
+        self.tag_cache = OrderedDict()
 
         # 批量处理相关
         self.batch_processor = None
         self.processing_dialog = None
 
+        # 文件夹扫描相关
+        self.folder_scanner = None
+        self.folder_dialog = None
+
         # 标准字段列表 (使用foobar内部字段名)
         self.standard_fields = [
             "ARTIST", "TITLE", "ALBUM", "GENRE", "COMPOSER",
@@ -1391,7 +1726,7 @@ class MusicTagEditor(QMainWindow):
         }
 
         # 支持的音频格式 (添加dsf)
-        self.supported_formats = {'.flac', '.mp3', '.wav', '.m4a', '.aac', '.ogg', '.dsf'}
+        self.supported_formats = SUPPORTED_FORMATS
 
         # 设置窗口
         self.setWindowTitle("音乐标签批量编辑器")
@@ -1470,9 +1805,12 @@ class MusicTagEditor(QMainWindow):
 
         layout.addLayout(btn_layout)
 
-        self.file_list_widget = QListWidget()
-        self.file_list_widget.setSelectionMode(QListWidget.MultiSelection)
-        self.file_list_widget.itemSelectionChanged.connect(self.on_file_selection_changed)
+        self.file_model = FileListModel(self.file_list, self)
+        self.file_list_widget = QListView()
+        self.file_list_widget.setModel(self.file_model)
+        self.file_list_widget.setSelectionMode(QListView.MultiSelection)
+        self.file_list_widget.setUniformItemSizes(True)
+        self.file_list_widget.selectionModel().selectionChanged.connect(self.on_file_selection_changed)
         layout.addWidget(self.file_list_widget)
 
         return widget
@@ -1515,6 +1853,10 @@ class MusicTagEditor(QMainWindow):
 
         self.custom_fields_container = QWidget()
         self.custom_fields_layout = QVBoxLayout(self.custom_fields_container)
+        self.custom_fields_grid = QGridLayout()
+        self.custom_fields_layout.addLayout(self.custom_fields_grid)
+        # 自定义字段复选框池，重新扫描时复用，不删除重建
+        self.custom_field_pool = []
         self.field_layout.addWidget(self.custom_fields_container)
         self.field_layout.addStretch()
 
@@ -1604,52 +1946,42 @@ class MusicTagEditor(QMainWindow):
         self.add_files(all_files)
 
     def scan_directory(self, directory):
-        """递归扫描目录中的音频文件"""
-        audio_files = []
-        for root, dirs, files in os.walk(directory):
-            for file in files:
-                if self.is_supported_format(file):
-                    file_path = os.path.join(root, file)
-                    audio_files.append(file_path)
-        return audio_files
-
-    def is_supported_format(self, filename):
-        """检查文件格式是否支持"""
-        ext = os.path.splitext(filename)[1].lower()
-        return ext in self.supported_formats
+        """递归扫描目录中的音频文件，逐个返回文件路径"""
+        for entry in iter_file_entries(directory):
+            if self.is_supported_entry(entry):
+                yield entry.path
+
+    @staticmethod
+    def is_supported_format(filename):
+        """检查文件格式是否支持，扩展名不区分大小写"""
+        return os.path.splitext(filename)[1].lower() in SUPPORTED_FORMATS
+
+    @staticmethod
+    def is_supported_entry(entry):
+        """检查目录条目是否为支持的音频文件，名为x.flac的目录或其链接不算"""
+        return MusicTagEditor.is_supported_format(entry.name) and entry.is_file()
 
     def add_files(self, files):
         """添加文件到列表"""
+        # 用集合判断重复，避免每个文件都线性查找整个列表
         new_files = []
         for file_path in files:
-            if file_path not in self.file_list:
-                self.file_list.append(file_path)
+            if file_path not in self.file_set:
+                self.file_set.add(file_path)
                 new_files.append(file_path)
 
         if new_files:
-            self.update_file_list()
+            # 只追加新文件，已有条目和选择状态保持不变
+            self.file_model.append_files(new_files)
             self.status_bar.showMessage(f"已添加 {len(new_files)} 个文件")
 
-            # 如果文件数量很大，优化显示
+            # 如果文件数量很大，显示总数
             if len(self.file_list) > 1000:
                 self.status_bar.showMessage(f"已添加 {len(new_files)} 个文件，当前总计 {len(self.file_list)} 个文件")
-                # 禁用列表更新以提高性能
-                self.file_list_widget.setUpdatesEnabled(False)
 
     def update_file_list(self):
         """更新文件列表显示"""
-        self.file_list_widget.clear()
-
-        # 对于大量文件，只显示文件名以提高性能
-        for file_path in self.file_list:
-            filename = os.path.basename(file_path)
-            item = QListWidgetItem(filename)
-            item.setToolTip(file_path)  # 显示完整路径
-            self.file_list_widget.addItem(item)
-
-        # 重新启用更新
-        self.file_list_widget.setUpdatesEnabled(True)
-        self.file_list_widget.update()
+        self.file_model.refresh()
 
     def select_files(self):
         """选择文件"""
@@ -1666,55 +1998,47 @@ class MusicTagEditor(QMainWindow):
         folder = QFileDialog.getExistingDirectory(self, "选择文件夹")
         if folder:
             # 显示进度对话框
-            dialog = ProcessingDialog("扫描文件夹")
-            dialog.show()
-
-            # 在小延迟后开始扫描，避免界面卡顿
-            QTimer.singleShot(100, lambda: self.scan_folder_with_progress(folder, dialog))
-
-    def scan_folder_with_progress(self, folder, dialog):
-        """带进度显示的文件夹扫描"""
-        try:
-            audio_files = []
-            total_files = 0
-            scanned_files = 0
-
-            # 先统计文件总数
-            for root, dirs, files in os.walk(folder):
-                total_files += len(files)
-
-            # 显示进度
-            dialog.label.setText(f"正在扫描文件夹...\n找到 {total_files} 个文件")
-
-            # 扫描文件
-            for root, dirs, files in os.walk(folder):
-                for file in files:
-                    if self.is_supported_format(file):
-                        file_path = os.path.join(root, file)
-                        audio_files.append(file_path)
-
-                    scanned_files += 1
-                    if scanned_files % 100 == 0:  # 每100个文件更新一次
-                        percent = int((scanned_files / total_files) * 100) if total_files > 0 else 0
-                        dialog.progress_bar.setValue(percent)
-                        QApplication.processEvents()  # 处理UI事件
-
-            dialog.close()
-
-            if audio_files:
-                self.add_files(audio_files)
-            else:
-                QMessageBox.warning(self, "警告", "该文件夹中没有找到支持的音频文件")
-
-        except Exception as e:
-            dialog.close()
-            QMessageBox.critical(self, "错误", f"扫描文件夹失败: {str(e)}")
+            self.folder_dialog = ProcessingDialog("扫描文件夹")
+            self.folder_dialog.label.setText("正在扫描文件夹...")
+            # 总数未知，进度条显示为忙碌状态
+            self.folder_dialog.progress_bar.setRange(0, 0)
+
+            # 在后台线程中扫描，界面线程只处理进度信号
+            self.folder_scanner = FolderScanner(folder)
+            self.folder_scanner.progress_updated.connect(self.on_folder_scan_progress)
+            self.folder_scanner.files_found.connect(self.add_files)
+            self.folder_scanner.scan_completed.connect(self.on_folder_scan_completed)
+            self.folder_dialog.cancel_btn.clicked.connect(self.folder_scanner.cancel)
+
+            self.folder_dialog.show()
+            self.folder_scanner.start()
+
+    def on_folder_scan_progress(self, scanned_files, found_files):
+        """文件夹扫描进度更新"""
+        if self.folder_dialog:
+            self.folder_dialog.label.setText(f"正在扫描文件夹...\n已扫描 {scanned_files} 个文件, 找到 {found_files}")
+
+    def on_folder_scan_completed(self, found_files):
+        """文件夹扫描完成"""
+        # 信号是排队送达的，等线程完全结束后再释放
+        self.folder_scanner.wait()
+        cancelled = self.folder_scanner.cancel_requested
+        self.folder_scanner = None
+        if self.folder_dialog:
+            self.folder_dialog.close()
+            self.folder_dialog = None
+
+        # 找到的文件已经分批加入列表
+        if cancelled:
+            self.status_bar.showMessage(f"已取消扫描文件夹，已加入 {found_files} 个文件")
+        elif not found_files:
+            QMessageBox.warning(self, "警告", "该文件夹中没有找到支持的音频文件")
 
     def clear_file_list(self):
         """清空文件列表"""
-        self.file_list.clear()
+        self.file_model.clear_files()
+        self.file_set.clear()
         self.selected_files.clear()
-        self.file_list_widget.clear()
         self.status_bar.showMessage("文件列表已清空")
 
     def select_all_files(self):
@@ -1724,16 +2048,20 @@ class MusicTagEditor(QMainWindow):
 
     def invert_selection(self):
         """反选文件"""
-        for i in range(self.file_list_widget.count()):
-            item = self.file_list_widget.item(i)
-            item.setSelected(not item.isSelected())
+        row_count = self.file_model.rowCount()
+        if row_count:
+            # 整个范围一次切换，不逐行设置
+            all_rows = QItemSelection(self.file_model.index(0), self.file_model.index(row_count - 1))
+            self.file_list_widget.selectionModel().select(all_rows, QItemSelectionModel.Toggle)
         self.on_file_selection_changed()
 
     def on_file_selection_changed(self):
         """文件选择变化事件"""
-        selected_items = self.file_list_widget.selectedItems()
-        self.selected_files = [self.file_list[i] for i in range(self.file_list_widget.count())
-                               if self.file_list_widget.item(i) in selected_items]
+        # 按选择区间展开行号，全选时只有一个区间，不用为每一行创建索引对象
+        rows = set()
+        for selection_range in self.file_list_widget.selectionModel().selection():
+            rows.update(range(selection_range.top(), selection_range.bottom() + 1))
+        self.selected_files = [self.file_list[row] for row in sorted(rows)]
 
         # 更新状态栏
         if self.selected_files:
@@ -1752,30 +2080,43 @@ class MusicTagEditor(QMainWindow):
 
     def update_custom_fields_display(self, custom_fields):
         """更新自定义字段显示"""
-        while self.custom_fields_layout.count():
-            item = self.custom_fields_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
+        # 去掉上次的自定义字段，标准字段的复选框保持不动
+        for field in self.custom_fields:
+            if field not in self.standard_fields:
+                self.field_checkboxes.pop(field, None)
 
         self.custom_fields = custom_fields
 
-        if custom_fields:
-            grid_layout = QGridLayout()
-            row, col = 0, 0
-
+        # 批量更新期间暂停重绘和布局计算，结束后只做一次
+        self.custom_fields_container.setUpdatesEnabled(False)
+        self.custom_fields_layout.setEnabled(False)
+        try:
             for i, field in enumerate(custom_fields):
-                cb = QCheckBox(field)
+                if i < len(self.custom_field_pool):
+                    cb = self.custom_field_pool[i]
+                else:
+                    cb = QCheckBox()
+                    self.custom_field_pool.append(cb)
+                    self.custom_fields_grid.addWidget(cb, i // 2, i % 2)
+                # 同一位置还是同一个字段时不重新设置文字，避免重新计算大小
+                if cb.property("field_name") != field:
+                    cb.setText(field)
+                    cb.setProperty("field_name", field)
                 cb.setChecked(True)
-                cb.setProperty("field_name", field)
+                if cb.isHidden():
+                    cb.show()
                 self.field_checkboxes[field] = cb
 
-                grid_layout.addWidget(cb, row, col)
-                col += 1
-                if col >= 2:
-                    col = 0
-                    row += 1
+            # 多余的复选框隐藏起来留给下次使用
+            for cb in self.custom_field_pool[len(custom_fields):]:
+                if not cb.isHidden():
+                    cb.hide()
+        finally:
+            self.custom_fields_layout.setEnabled(True)
+            self.custom_fields_layout.activate()
+            self.custom_fields_container.setUpdatesEnabled(True)
 
-            self.custom_fields_layout.addLayout(grid_layout)
+        if custom_fields:
             self.custom_fields_label.show()
         else:
             self.custom_fields_label.hide()
@@ -1820,6 +2161,7 @@ class MusicTagEditor(QMainWindow):
         """更新操作列表"""
         self.operations_list.clear()
 
+        display_texts = []
         for i, op in enumerate(self.tag_processor.operations):
             if op.apply_to_all:
                 display_text = f"{i + 1}. {op.op_type.value} -> [所有字段]"
@@ -1834,7 +2176,10 @@ class MusicTagEditor(QMainWindow):
             if op.text:
                 display_text += f" 文本:'{op.text[:20]}...'" if len(op.text) > 20 else f" 文本:'{op.text}'"
 
-            self.operations_list.addItem(display_text)
+            display_texts.append(display_text)
+
+        # 一次性加入所有条目
+        self.operations_list.addItems(display_texts)
 
     def on_operation_selection_changed(self):
         """操作选择变化事件"""
@@ -1944,11 +2289,13 @@ class MusicTagEditor(QMainWindow):
             # 限制预览文件数量，避免内存溢出
             preview_files = self.selected_files[:10]  # 增加到10个文件预览
             total_files = len(self.selected_files)
+            program = self.tag_processor.compile_operations(selected_fields)
+
+            all_original_tags = self.read_preview_tags(preview_files)
 
-            for i, file_path in enumerate(preview_files):
+            for i, (file_path, original_tags) in enumerate(zip(preview_files, all_original_tags)):
                 preview_text += f"文件 {i + 1}/{len(preview_files)}: {os.path.basename(file_path)}\n"
-                original_tags = self.tag_processor.read_file_tags(file_path)
-                modified_tags = self.tag_processor.preview_changes(original_tags, selected_fields)
+                modified_tags = self.tag_processor.run_program(program, original_tags)
 
                 for field in selected_fields:
                     original = original_tags.get(field, "")
@@ -1965,10 +2312,6 @@ class MusicTagEditor(QMainWindow):
                     'modified': modified_tags
                 }
 
-                # 处理UI事件，避免界面卡顿
-                if i % 5 == 0:
-                    QApplication.processEvents()
-
             if total_files > 10:
                 preview_text += f"\n... 还有 {total_files - 10} 个文件未显示预览\n"
 
@@ -1979,6 +2322,49 @@ class MusicTagEditor(QMainWindow):
             QMessageBox.critical(self, "错误", f"预览失败: {str(e)}")
             traceback.print_exc()
 
+    def _read_preview_file(self, file_path):
+        """读取单个预览文件的标签，读取失败时返回None"""
+        try:
+            return self.tag_processor._open_audio(file_path)[1]
+        except Exception as e:
+            print(f"读取标签失败 {file_path}: {e}")
+            return None
+
+    def read_preview_tags(self, file_paths):
+        """读取预览文件的标签，文件修改时间和大小没变时直接使用缓存"""
+        tags_by_path = {}
+        missing = []
+        for file_path in file_paths:
+            try:
+                st = os.stat(file_path)
+                signature = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                signature = None
+
+            cached = self.tag_cache.get(file_path)
+            if signature is not None and cached is not None and cached[0] == signature:
+                self.tag_cache.move_to_end(file_path)
+                tags_by_path[file_path] = cached[1]
+            else:
+                missing.append((file_path, signature))
+
+        if missing:
+            # 读取标签主要是等待磁盘，用线程池同时读取没有缓存的文件
+            missing_paths = [file_path for file_path, signature in missing]
+            with ThreadPoolExecutor(max_workers=min(8, len(missing))) as executor:
+                results = executor.map(self._read_preview_file, missing_paths)
+                for (file_path, signature), tags in zip(missing, results):
+                    # 读取失败时本次按空标签预览，但不缓存，下次预览重新读取
+                    tags_by_path[file_path] = tags if tags is not None else {}
+                    if tags is not None and signature is not None:
+                        self.tag_cache[file_path] = (signature, tags)
+                        self.tag_cache.move_to_end(file_path)
+
+            while len(self.tag_cache) > self.TAG_CACHE_SIZE:
+                self.tag_cache.popitem(last=False)
+
+        return [tags_by_path[file_path] for file_path in file_paths]
+
     def apply_changes(self):
         """应用修改"""
         if not self.selected_files:
@@ -2049,6 +2435,11 @@ class MusicTagEditor(QMainWindow):
         self.current_preview.clear()
         self.preview_text.clear()
 
+        # 处理过的文件标签可能已经改变，从缓存中去掉
+        if self.batch_processor:
+            for file_path in self.batch_processor.file_paths:
+                self.tag_cache.pop(file_path, None)
+
         # 清空处理器
         self.batch_processor = None
 
@@ -2091,11 +2482,22 @@ class MusicTagEditor(QMainWindow):
         )
 
         if file_path:
+            temp_path = None
             try:
-                with open(file_path, 'w', encoding='utf-8') as f:
+                # 先在同一目录写临时文件再替换，保存中途退出也不会留下写了一半的配置
+                with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.tmp', delete=False,
+                                                 dir=os.path.dirname(os.path.abspath(file_path))) as f:
+                    temp_path = f.name
                     json.dump(config, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, file_path)
                 self.status_bar.showMessage("配置已保存")
             except Exception as e:
+                # 保存失败时删除临时文件
+                if temp_path is not None:
+                    try:
+                        os.remove(temp_path)
+                    except OSError:
+                        pass
                 QMessageBox.critical(self, "错误", f"保存配置失败: {str(e)}")
 
     def load_config(self):
@@ -2144,6 +2546,9 @@ class MusicTagEditor(QMainWindow):
 
 def main():
     """主函数"""
+    # 打包后的程序启动子进程时需要
+    multiprocessing.freeze_support()
+
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
 
@@ -1,6 +1,8 @@
 import os
 import re
 from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
 from dataclasses import dataclass, field
 from enum import Enum
 import mutagen
@@ -8,7 +10,10 @@ from mutagen.flac import FLAC
 from mutagen.mp3 import MP3
 from mutagen.id3 import ID3
 from mutagen.wave import WAVE
+from mutagen.dsf import DSF
 import mutagen.id3 as id3
+from utils import (beets_available, get_beets, compile_bracket_pattern, WHITESPACE_PATTERN,
+                   PUNCTUATION_TABLES, MP3_FIELD_MAP, MP3_FIELD_MAP_INV)
 
 
 class OperationType(Enum):
@@ -26,7 +31,7 @@ class OperationType(Enum):
     CONVERT_PUNCTUATION = "转换标点"
 
 
-@dataclass
+@dataclass(slots=True)
 class TagOperation:
     """标签操作类"""
     op_type: OperationType
@@ -39,6 +44,158 @@ class TagOperation:
     length: int = 0
     brackets: List[str] = field(default_factory=list)
     separator: str = ""  # 字段插入时的分隔符
+    # 预编译的括号正则，由add_operation填充
+    bracket_pattern: re.Pattern = field(default=None, init=False, repr=False, compare=False)
+
+
+# 标准字段列表
+STANDARD_FIELDS = (
+    "ARTIST", "TITLE", "ALBUM", "GENRE", "COMPOSER",
+    "PERFORMER", "ALBUMARTIST", "DATE", "TRACKNUMBER",
+    "TRACKTOTAL", "DISCNUMBER", "TOTALDISCS", "COMMENT"
+)
+# 所有标准字段为空的标签，读取结果与它合并以确保标准字段都存在
+EMPTY_STANDARD_TAGS = {field: "" for field in STANDARD_FIELDS}
+
+# DSF同样使用ID3标签，mutagen写入时的字段映射与MP3相同
+DSF_FIELD_MAP = MP3_FIELD_MAP
+
+# 标签字段 -> beets字段
+BEETS_FIELD_MAP = {
+    'ARTIST': 'artist',
+    'TITLE': 'title',
+    'ALBUM': 'album',
+    'GENRE': 'genre',
+    'COMPOSER': 'composer',
+    'PERFORMER': 'performer',
+    'ALBUMARTIST': 'albumartist',
+    'DATE': 'year',
+    'TRACKNUMBER': 'track',
+    'TRACKTOTAL': 'tracktotal',
+    'DISCNUMBER': 'disc',
+    'TOTALDISCS': 'disctotal',
+    'COMMENT': 'comments'
+}
+# beets字段 -> 标签字段
+BEETS_FIELD_MAP_INV = {beets_field: field for field, beets_field in BEETS_FIELD_MAP.items()}
+
+
+# ============================================================================
+# 标签操作处理函数
+# ============================================================================
+def _op_replace(operation, current_value, original_tags):
+    """替换文本"""
+    return current_value.replace(operation.old_text, operation.new_text)
+
+
+def _op_insert_text_prefix(operation, current_value, original_tags):
+    """插入文本前缀"""
+    return operation.text + current_value
+
+
+def _op_insert_text_suffix(operation, current_value, original_tags):
+    """插入文本后缀"""
+    return current_value + operation.text
+
+
+def _op_insert_field_prefix(operation, current_value, original_tags):
+    """插入字段前缀"""
+    source_value = original_tags.get(operation.source_field, "")
+    if source_value:
+        return source_value + operation.separator + current_value
+    return current_value
+
+
+def _op_insert_field_suffix(operation, current_value, original_tags):
+    """插入字段后缀"""
+    source_value = original_tags.get(operation.source_field, "")
+    if source_value:
+        return current_value + operation.separator + source_value
+    return current_value
+
+
+def _op_insert_field_position(operation, current_value, original_tags):
+    """插入字段到位置"""
+    source_value = original_tags.get(operation.source_field, "")
+    if not source_value:
+        return current_value
+    if operation.position <= len(current_value):
+        return (current_value[:operation.position] +
+                operation.separator + source_value +
+                current_value[operation.position:])
+    return current_value + operation.separator + source_value
+
+
+def _op_delete_range(operation, current_value, original_tags):
+    """删除范围"""
+    if operation.position < len(current_value):
+        end_pos = min(operation.position + operation.length, len(current_value))
+        return current_value[:operation.position] + current_value[end_pos:]
+    return current_value
+
+
+def _op_insert_position(operation, current_value, original_tags):
+    """插入到位置"""
+    if operation.position <= len(current_value):
+        return (current_value[:operation.position] +
+                operation.text +
+                current_value[operation.position:])
+    return current_value + operation.text
+
+
+def _op_remove_brackets(operation, current_value, original_tags):
+    """清除括号及内容"""
+    pattern = operation.bracket_pattern
+    if pattern is None:
+        pattern = compile_bracket_pattern(operation.brackets)
+        if pattern is None:
+            return current_value
+
+    # 所有括号对合并为一个正则，只扫描一遍
+    return pattern.sub('', current_value)
+
+
+def _op_trim_spaces(operation, current_value, original_tags):
+    """修剪空格"""
+    new_value = current_value
+    if operation.new_text in ["两端空格", "全部"]:
+        new_value = new_value.strip()
+    if operation.new_text in ["重复空格", "全部"]:
+        new_value = WHITESPACE_PATTERN.sub(' ', new_value)
+    return new_value
+
+
+def _op_convert_punctuation(operation, current_value, original_tags):
+    """转换标点"""
+    table = PUNCTUATION_TABLES.get(operation.new_text)
+    if table is None:
+        return current_value
+    return current_value.translate(table)
+
+
+# 作用于空字符串时结果不变的操作，空字段可以直接跳过
+# 替换不在其中：查找文本为空时 "".replace("", 新文本) 会得到新文本
+EMPTY_NOOP_OPERATIONS = frozenset({
+    OperationType.DELETE_RANGE,
+    OperationType.REMOVE_BRACKETS,
+    OperationType.TRIM_SPACES,
+    OperationType.CONVERT_PUNCTUATION,
+})
+
+# 操作类型 -> 处理函数
+OPERATION_HANDLERS = {
+    OperationType.REPLACE: _op_replace,
+    OperationType.INSERT_TEXT_PREFIX: _op_insert_text_prefix,
+    OperationType.INSERT_TEXT_SUFFIX: _op_insert_text_suffix,
+    OperationType.INSERT_FIELD_PREFIX: _op_insert_field_prefix,
+    OperationType.INSERT_FIELD_SUFFIX: _op_insert_field_suffix,
+    OperationType.INSERT_FIELD_POSITION: _op_insert_field_position,
+    OperationType.DELETE_RANGE: _op_delete_range,
+    OperationType.INSERT_POSITION: _op_insert_position,
+    OperationType.REMOVE_BRACKETS: _op_remove_brackets,
+    OperationType.TRIM_SPACES: _op_trim_spaces,
+    OperationType.CONVERT_PUNCTUATION: _op_convert_punctuation,
+}
 
 
 class MusicTagProcessor:
@@ -49,6 +206,8 @@ class MusicTagProcessor:
 
     def add_operation(self, operation: TagOperation):
         """添加操作"""
+        if operation.op_type == OperationType.REMOVE_BRACKETS:
+            operation.bracket_pattern = compile_bracket_pattern(operation.brackets)
         self.operations.append(operation)
 
     def clear_operations(self):
@@ -57,241 +216,174 @@ class MusicTagProcessor:
 
     def preview_changes(self, original_tags: Dict[str, str], selected_fields: List[str]) -> Dict[str, str]:
         """预览修改"""
-        modified_tags = original_tags.copy()
+        # 只记录改动过的字段，最后再与原始标签合并
+        modified_tags = {}
+        # 循环中频繁判断字段是否选中，先转为集合
+        if not isinstance(selected_fields, (set, frozenset)):
+            selected_fields = frozenset(selected_fields)
+
+        # 循环中用到的全局表先绑定为局部变量
+        handlers = OPERATION_HANDLERS
+        empty_noop_operations = EMPTY_NOOP_OPERATIONS
 
         for operation in self.operations:
-            if operation.target_field not in selected_fields:
+            target_field = operation.target_field
+            if target_field not in selected_fields:
                 continue
 
-            current_value = modified_tags.get(operation.target_field, "")
-
-            # 根据操作类型处理
-            if operation.op_type == OperationType.REPLACE:
-                new_value = current_value.replace(operation.old_text, operation.new_text)
-
-            elif operation.op_type == OperationType.INSERT_TEXT_PREFIX:
-                new_value = operation.text + current_value
-
-            elif operation.op_type == OperationType.INSERT_TEXT_SUFFIX:
-                new_value = current_value + operation.text
-
-            elif operation.op_type == OperationType.INSERT_FIELD_PREFIX:
-                source_value = original_tags.get(operation.source_field, "")
-                if source_value:
-                    new_value = source_value + operation.separator + current_value
-                else:
-                    new_value = current_value
-
-            elif operation.op_type == OperationType.INSERT_FIELD_SUFFIX:
-                source_value = original_tags.get(operation.source_field, "")
-                if source_value:
-                    new_value = current_value + operation.separator + source_value
-                else:
-                    new_value = current_value
-
-            elif operation.op_type == OperationType.INSERT_FIELD_POSITION:
-                source_value = original_tags.get(operation.source_field, "")
-                if source_value:
-                    if operation.position <= len(current_value):
-                        new_value = (current_value[:operation.position] +
-                                     operation.separator + source_value +
-                                     current_value[operation.position:])
-                    else:
-                        new_value = current_value + operation.separator + source_value
-                else:
-                    new_value = current_value
-
-            elif operation.op_type == OperationType.DELETE_RANGE:
-                if operation.position < len(current_value):
-                    end_pos = min(operation.position + operation.length, len(current_value))
-                    new_value = current_value[:operation.position] + current_value[end_pos:]
-                else:
-                    new_value = current_value
-
-            elif operation.op_type == OperationType.INSERT_POSITION:
-                if operation.position <= len(current_value):
-                    new_value = (current_value[:operation.position] +
-                                 operation.text +
-                                 current_value[operation.position:])
-                else:
-                    new_value = current_value + operation.text
-
-            elif operation.op_type == OperationType.REMOVE_BRACKETS:
-                new_value = current_value
-                for brackets in operation.brackets:
-                    if len(brackets) == 2:
-                        open_bracket, close_bracket = brackets[0], brackets[1]
-                        # 使用正则表达式删除括号及内容
-                        pattern = re.escape(open_bracket) + '.*?' + re.escape(close_bracket)
-                        new_value = re.sub(pattern, '', new_value)
-
-            elif operation.op_type == OperationType.TRIM_SPACES:
-                new_value = current_value
-                if operation.new_text in ["两端空格", "全部"]:
-                    new_value = new_value.strip()
-                if operation.new_text in ["重复空格", "全部"]:
-                    new_value = re.sub(r'\s+', ' ', new_value)
-
-            elif operation.op_type == OperationType.CONVERT_PUNCTUATION:
-                new_value = current_value
-                if operation.new_text == "中文转英文":
-                    # 中文标点转英文标点
-                    chinese_punctuation = '，。！？；："‘’""（）【】《》'
-                    english_punctuation = ',.!?;:\'""""()[]<>'
-                    trans_table = str.maketrans(chinese_punctuation, english_punctuation)
-                    new_value = new_value.translate(trans_table)
-                elif operation.new_text == "英文转中文":
-                    # 英文标点转中文标点
-                    english_punctuation = ',.!?;:\'""""()[]<>'
-                    chinese_punctuation = '，。！？；："‘’""（）【】《》'
-                    trans_table = str.maketrans(english_punctuation, chinese_punctuation)
-                    new_value = new_value.translate(trans_table)
+            op_type = operation.op_type
+            if target_field in modified_tags:
+                current_value = modified_tags[target_field]
+            else:
+                current_value = original_tags.get(target_field, "")
+            if not current_value and op_type in empty_noop_operations:
+                continue
 
+            handler = handlers.get(op_type)
+            if handler:
+                new_value = handler(operation, current_value, original_tags)
             else:
                 new_value = current_value
 
-            modified_tags[operation.target_field] = new_value
+            modified_tags[target_field] = new_value
 
-        return modified_tags
+        return {**original_tags, **modified_tags}
 
     def apply_to_file(self, file_path: str, selected_fields: List[str]):
         """应用到文件"""
+        # 读取和写入共用同一个mutagen对象，文件只解析一次
+        audio = self.open_audio(file_path)
+
         # 读取原始标签
-        original_tags = self.read_file_tags(file_path)
+        original_tags = self.read_file_tags(file_path, audio)
 
         # 计算新标签
         new_tags = self.preview_changes(original_tags, selected_fields)
 
         # 写入文件
-        self.write_file_tags(file_path, original_tags, new_tags)
+        self.write_file_tags(file_path, original_tags, new_tags, audio)
+
+    def apply_to_files(self, file_paths: List[str], selected_fields: List[str], max_workers: int = 8):
+        """批量应用到文件，读写标签主要是等待磁盘，用线程池同时处理多个文件"""
+        if not file_paths:
+            return
+        selected_fields = frozenset(selected_fields)
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(file_paths))) as executor:
+            list(executor.map(self.apply_to_file, file_paths, repeat(selected_fields)))
+
+    def open_audio(self, file_path: str):
+        """打开文件供读写标签共用，DSF等不能共用的格式或打开失败时返回None"""
+        ext = os.path.splitext(file_path)[1].lower()
+        opener = FILE_AUDIO_OPENERS.get(ext, _open_other)
+        if opener is None:
+            return None
+        try:
+            return opener(file_path)
+        except Exception:
+            # 交给读取方法重新打开并报告错误
+            return None
 
-    def read_file_tags(self, file_path: str) -> Dict[str, str]:
-        """读取文件标签"""
+    def read_file_tags(self, file_path: str, audio=None) -> Dict[str, str]:
+        """读取文件标签，audio为open_audio打开的对象时直接使用"""
         try:
             ext = os.path.splitext(file_path)[1].lower()
+            reader = FILE_TAG_READERS.get(ext, MusicTagProcessor._read_other_tags)
+            tags = reader(self, file_path, audio)
 
-            if ext == '.flac':
-                audio = FLAC(file_path)
-                tags = {k.upper(): str(v[0]) if v else "" for k, v in audio.tags.items()}
-
-            elif ext == '.mp3':
-                audio = MP3(file_path, ID3=ID3)
-                tags = {}
-                if audio.tags:
-                    for key in audio.tags.keys():
-                        if key.startswith('T'):
-                            tag_name = id3.ID3._get_frame_name(key)[0]
-                            if tag_name:
-                                text = str(audio.tags[key])
-                                if text:
-                                    tags[tag_name.upper()] = text
-
-            elif ext == '.wav':
-                audio = WAVE(file_path)
-                if audio.tags:
-                    tags = {k.upper(): str(v[0]) if v else "" for k, v in audio.tags.items()}
-                else:
-                    tags = {}
+            # 确保所有标准字段都存在
+            return EMPTY_STANDARD_TAGS | tags
 
-            elif ext == '.dsf':
-                # DSF文件处理 - 尝试多种方法
-                tags = {}
+        except Exception as e:
+            print(f"读取标签失败 {file_path}: {e}")
+            # 返回包含所有标准字段的空字典
+            return dict(EMPTY_STANDARD_TAGS)
+
+    def _read_flac_tags(self, file_path: str, audio=None) -> Dict[str, str]:
+        """读取FLAC文件标签"""
+        if audio is None:
+            audio = FLAC(file_path)
+        return {k.upper(): str(v[0]) if v else "" for k, v in audio.tags.items()}
+
+    def _read_mp3_tags(self, file_path: str, audio=None) -> Dict[str, str]:
+        """读取MP3文件标签"""
+        if audio is None:
+            audio = MP3(file_path, ID3=ID3)
+        tags = {}
+        if audio.tags:
+            for frame in audio.tags.values():
+                frame_id = frame.FrameID
+                if frame_id == 'TXXX':
+                    # 自定义字段按描述读取，与写入时一致
+                    tags[frame.desc.upper()] = frame.text[0] if frame.text else ""
+                elif frame_id.startswith('T') or frame_id == 'COMM':
+                    # 没有对应字段的帧（如TSSE、TENC）跳过
+                    tag_name = MP3_FIELD_MAP_INV.get(frame_id)
+                    # 有多个注释帧时只取第一个
+                    if tag_name and tag_name not in tags:
+                        text = str(frame)
+                        if text:
+                            tags[tag_name] = text
+        return tags
+
+    def _read_wav_tags(self, file_path: str, audio=None) -> Dict[str, str]:
+        """读取WAV文件标签"""
+        if audio is None:
+            audio = WAVE(file_path)
+        if audio.tags:
+            return {k.upper(): str(v[0]) if v else "" for k, v in audio.tags.items()}
+        return {}
+
+    def _read_dsf_tags(self, file_path: str, audio=None) -> Dict[str, str]:
+        """读取DSF文件标签 - 尝试多种方法（各方法各自打开文件，不使用audio）"""
+        tags = {}
+
+        # 方法1: 尝试使用beets读取标准字段
+        try:
+            Item, syspath = get_beets()
+            item = Item.from_path(syspath(file_path))
 
-                # 方法1: 尝试使用beets读取标准字段
+            for beets_field, our_field in BEETS_FIELD_MAP_INV.items():
                 try:
-                    from beets.library import Library, Item
-                    from beets import config
-                    from beets.util import syspath
-
-                    config.clear()
-                    config.read(user=False)
-
-                    lib = Library(':memory:')
-                    item = Item.from_path(syspath(file_path))
-
-                    field_mapping = {
-                        'artist': 'ARTIST',
-                        'title': 'TITLE',
-                        'album': 'ALBUM',
-                        'genre': 'GENRE',
-                        'composer': 'COMPOSER',
-                        'performer': 'PERFORMER',
-                        'albumartist': 'ALBUMARTIST',
-                        'year': 'DATE',
-                        'track': 'TRACKNUMBER',
-                        'tracktotal': 'TRACKTOTAL',
-                        'disc': 'DISCNUMBER',
-                        'disctotal': 'TOTALDISCS',
-                        'comments': 'COMMENT'
-                    }
-
-                    for beets_field, our_field in field_mapping.items():
-                        try:
-                            value = getattr(item, beets_field)
-                            if value is not None:
-                                tags[our_field] = str(value)
-                        except AttributeError:
-                            pass
-
-                except Exception as beets_error:
-                    print(f"beets读取DSF失败 {file_path}: {beets_error}")
-                    # 方法2: 回退到mutagen
-                    try:
-                        audio = mutagen.File(file_path, easy=True)
-                        if audio:
-                            tags = {k.upper(): str(v[0]) if v else "" for k, v in audio.items()}
-                    except Exception as mutagen_error:
-                        print(f"mutagen读取DSF失败 {file_path}: {mutagen_error}")
-                        tags = {}
-
-                # 方法3: 尝试读取自定义字段
-                try:
-                    custom_tags = self._read_dsf_custom_tags(file_path)
-                    if custom_tags:
-                        tags.update(custom_tags)
-                except Exception as custom_error:
-                    print(f"读取DSF自定义字段失败 {file_path}: {custom_error}")
+                    value = getattr(item, beets_field)
+                    if value is not None:
+                        tags[our_field] = str(value)
+                except AttributeError:
+                    pass
 
-            else:
-                # 其他格式
+        except Exception as beets_error:
+            print(f"beets读取DSF失败 {file_path}: {beets_error}")
+            # 方法2: 回退到mutagen
+            try:
                 audio = mutagen.File(file_path, easy=True)
                 if audio:
                     tags = {k.upper(): str(v[0]) if v else "" for k, v in audio.items()}
-                else:
-                    tags = {}
-
-            # 标准字段列表
-            standard_fields = [
-                "ARTIST", "TITLE", "ALBUM", "GENRE", "COMPOSER",
-                "PERFORMER", "ALBUMARTIST", "DATE", "TRACKNUMBER",
-                "TRACKTOTAL", "DISCNUMBER", "TOTALDISCS", "COMMENT"
-            ]
-
-            # 确保所有标准字段都存在
-            for field in standard_fields:
-                if field not in tags:
-                    tags[field] = ""
-
-            return tags
+            except Exception as mutagen_error:
+                print(f"mutagen读取DSF失败 {file_path}: {mutagen_error}")
+                tags = {}
 
-        except Exception as e:
-            print(f"读取标签失败 {file_path}: {e}")
-            # 返回包含所有标准字段的空字典
-            return {field: "" for field in [
-                "ARTIST", "TITLE", "ALBUM", "GENRE", "COMPOSER",
-                "PERFORMER", "ALBUMARTIST", "DATE", "TRACKNUMBER",
-                "TRACKTOTAL", "DISCNUMBER", "TOTALDISCS", "COMMENT"
-            ]}
+        # 方法3: 尝试读取自定义字段
+        try:
+            custom_tags = self._read_dsf_custom_tags(file_path)
+            if custom_tags:
+                tags.update(custom_tags)
+        except Exception as custom_error:
+            print(f"读取DSF自定义字段失败 {file_path}: {custom_error}")
+
+        return tags
+
+    def _read_other_tags(self, file_path: str, audio=None) -> Dict[str, str]:
+        """读取其他格式文件标签"""
+        if audio is None:
+            audio = mutagen.File(file_path, easy=True)
+        if audio:
+            return {k.upper(): str(v[0]) if v else "" for k, v in audio.items()}
+        return {}
 
     def _read_dsf_custom_tags(self, file_path: str) -> Dict[str, str]:
         """读取DSF自定义字段"""
         try:
-            # 尝试使用mutagen的DSF模块
-            try:
-                from mutagen.dsf import DSF
-                audio = DSF(file_path)
-            except ImportError:
-                return {}
+            # 使用mutagen的DSF模块
+            audio = DSF(file_path)
 
             if not audio or not audio.tags:
                 return {}
@@ -309,7 +401,7 @@ class MusicTagProcessor:
 
             try:
                 # 处理TXXX帧（自定义字段）
-                if 'TXXX' in audio.tags:
+                if audio.tags.getall('TXXX'):  # 键带描述（TXXX:MOOD），不能直接用in判断
                     txxx_frames = audio.tags.getall('TXXX')
                     for frame in txxx_frames:
                         if hasattr(frame, 'desc') and hasattr(frame, 'text'):
@@ -323,17 +415,14 @@ class MusicTagProcessor:
                 # 遍历所有帧
                 for frame_id in list(audio.tags.keys()):
                     try:
-                        # 跳过已处理的和标准的TXXX
-                        if frame_id == 'TXXX':
-                            continue
-
-                        # 跳过已知的标准字段ID
-                        if frame_id in standard_fields:
-                            continue
-
                         # 尝试获取帧
                         frame = audio.tags[frame_id]
 
+                        # 按帧ID判断，TXXX和COMM的键带描述（如TXXX:MOOD、COMM::eng）；
+                        # 跳过已处理的TXXX和已知的标准帧
+                        if frame.FrameID == 'TXXX' or frame.FrameID in standard_fields:
+                            continue
+
                         # 尝试获取文本内容
                         if hasattr(frame, 'text'):
                             if hasattr(frame.text, '__len__') and len(frame.text) > 0:
@@ -342,15 +431,8 @@ class MusicTagProcessor:
                                 text_value = str(frame.text) if frame.text else ""
 
                             if text_value:
-                                # 尝试获取人类可读的帧名
-                                try:
-                                    frame_name = id3.ID3._get_frame_name(frame_id)[0]
-                                    if frame_name:
-                                        tags[frame_name.upper()] = text_value
-                                    else:
-                                        tags[frame_id] = text_value
-                                except:
-                                    tags[frame_id] = text_value
+                                # 其他帧没有对应的字段名，按帧ID保存
+                                tags[frame.FrameID] = text_value
 
                     except Exception as frame_error:
                         continue
@@ -364,166 +446,135 @@ class MusicTagProcessor:
             print(f"读取DSF自定义字段失败 {file_path}: {e}")
             return {}
 
-    def write_file_tags(self, file_path: str, original_tags: Dict[str, str], new_tags: Dict[str, str]):
-        """写入文件标签"""
+    def write_file_tags(self, file_path: str, original_tags: Dict[str, str], new_tags: Dict[str, str],
+                        audio=None):
+        """写入文件标签，audio为open_audio打开的对象时直接使用"""
+        # 先比较出改动的字段，没有改动时不打开文件
+        changed_tags = {field: value for field, value in new_tags.items()
+                        if value != original_tags.get(field, "")}
+        if not changed_tags:
+            return
+
         try:
             ext = os.path.splitext(file_path)[1].lower()
+            writer = FILE_TAG_WRITERS.get(ext, MusicTagProcessor._write_other_tags)
+            writer(self, file_path, changed_tags, new_tags, audio)
 
-            if ext == '.flac':
-                audio = FLAC(file_path)
-
-                for field, value in new_tags.items():
-                    if value != original_tags.get(field, ""):
-                        if value:  # 非空值
-                            audio[field] = [value]
-                        elif field in audio:  # 空值则删除
-                            del audio[field]
-
-                audio.save()
-
-            elif ext == '.mp3':
-                audio = MP3(file_path, ID3=ID3)
-
-                # 确保有ID3标签
-                if audio.tags is None:
-                    audio.add_tags()
-
-                # MP3字段映射
-                mp3_field_map = {
-                    'TITLE': 'TIT2',
-                    'ARTIST': 'TPE1',
-                    'ALBUM': 'TALB',
-                    'DATE': 'TDRC',
-                    'GENRE': 'TCON',
-                    'TRACKNUMBER': 'TRCK',
-                    'COMPOSER': 'TCOM',
-                    'PERFORMER': 'TPE2',
-                    'ALBUMARTIST': 'TPE2',
-                    'COMMENT': 'COMM',
-                    'DISCNUMBER': 'TPOS',
-                }
-
-                for field, value in new_tags.items():
-                    if value != original_tags.get(field, ""):
-                        mp3_field = mp3_field_map.get(field)
-                        if mp3_field:
-                            if value:
-                                # 特殊处理TRACKNUMBER和TRACKTOTAL
-                                if field == 'TRACKNUMBER':
-                                    tracktotal = new_tags.get('TRACKTOTAL', '')
-                                    if tracktotal:
-                                        value = f"{value}/{tracktotal}"
-                                elif field == 'TRACKTOTAL':
-                                    # 跳过，因为已经在TRACKNUMBER中处理了
-                                    continue
-
-                                # 特殊处理DISCNUMBER
-                                if field == 'DISCNUMBER':
-                                    totaldiscs = new_tags.get('TOTALDISCS', '')
-                                    if totaldiscs:
-                                        value = f"{value}/{totaldiscs}"
-                                elif field == 'TOTALDISCS':
-                                    # 跳过，因为已经在DISCNUMBER中处理了
-                                    continue
-
-                                # 创建或更新帧
-                                frame_class = getattr(id3, mp3_field, None)
-                                if frame_class:
-                                    audio.tags.add(frame_class(encoding=3, text=value))
-                            elif mp3_field in audio.tags:
-                                # 删除帧
-                                del audio.tags[mp3_field]
-                        else:
-                            # 自定义字段
-                            if value:
-                                audio.tags.add(id3.TXXX(encoding=3, desc=field, text=value))
-                            elif field in [frame.desc for frame in audio.tags.getall('TXXX')]:
-                                # 删除自定义字段
-                                for frame in audio.tags.getall('TXXX'):
-                                    if frame.desc == field:
-                                        audio.tags.remove(frame)
+        except Exception as e:
+            print(f"写入标签失败 {file_path}: {e}")
+            # 不抛出异常，让程序继续
+            pass
 
-                audio.save()
+    def _write_flac_tags(self, file_path: str, changed_tags: Dict[str, str], new_tags: Dict[str, str], audio=None):
+        """写入FLAC文件标签"""
+        if audio is None:
+            audio = FLAC(file_path)
+
+        for field, value in changed_tags.items():
+            if value:  # 非空值
+                audio[field] = [value]
+            elif field in audio:  # 空值则删除
+                del audio[field]
+
+        audio.save()
+
+    def _write_mp3_tags(self, file_path: str, changed_tags: Dict[str, str], new_tags: Dict[str, str], audio=None):
+        """写入MP3文件标签"""
+        if audio is None:
+            audio = MP3(file_path, ID3=ID3)
+
+        # 确保有ID3标签
+        if audio.tags is None:
+            audio.add_tags()
+
+        for field, value in changed_tags.items():
+            mp3_field = MP3_FIELD_MAP.get(field)
+            if mp3_field:
+                if value:
+                    # 特殊处理TRACKNUMBER和TRACKTOTAL
+                    if field == 'TRACKNUMBER':
+                        tracktotal = new_tags.get('TRACKTOTAL', '')
+                        if tracktotal:
+                            value = f"{value}/{tracktotal}"
+                    elif field == 'TRACKTOTAL':
+                        # 跳过，因为已经在TRACKNUMBER中处理了
+                        continue
 
-            elif ext == '.wav':
-                audio = WAVE(file_path)
+                    # 特殊处理DISCNUMBER
+                    if field == 'DISCNUMBER':
+                        totaldiscs = new_tags.get('TOTALDISCS', '')
+                        if totaldiscs:
+                            value = f"{value}/{totaldiscs}"
+                    elif field == 'TOTALDISCS':
+                        # 跳过，因为已经在DISCNUMBER中处理了
+                        continue
 
-                if audio.tags is None:
-                    # 如果没有标签，尝试添加
-                    pass
+                    # 创建或更新帧，先删除同类的所有帧（如COMM::eng），避免重复
+                    frame_class = getattr(id3, mp3_field, None)
+                    if frame_class:
+                        audio.tags.delall(mp3_field)
+                        audio.tags.add(frame_class(encoding=3, text=value))
                 else:
-                    for field, value in new_tags.items():
-                        if value != original_tags.get(field, ""):
-                            if value:
-                                audio[field] = [value]
-                            elif field in audio:
-                                del audio[field]
-
-                audio.save()
-
-            elif ext == '.dsf':
-                # DSF文件写入
-                self._write_dsf_tags(file_path, original_tags, new_tags)
-
+                    # 删除帧
+                    audio.tags.delall(mp3_field)
             else:
-                # 其他格式
-                audio = mutagen.File(file_path, easy=True)
-                if audio:
-                    for field, value in new_tags.items():
-                        if value != original_tags.get(field, ""):
-                            if value:
-                                audio[field.lower()] = value
-                            elif field.lower() in audio:
-                                del audio[field.lower()]
+                # 自定义字段 (TXXX)，描述不区分大小写，与读取时一致
+                audio.tags.setall('TXXX', [frame for frame in audio.tags.getall('TXXX')
+                                           if frame.desc.upper() != field])
+                if value:
+                    audio.tags.add(id3.TXXX(encoding=3, desc=field, text=value))
 
-                    audio.save()
+        audio.save()
 
-        except Exception as e:
-            print(f"写入标签失败 {file_path}: {e}")
-            # 不抛出异常，让程序继续
-            pass
+    def _write_wav_tags(self, file_path: str, changed_tags: Dict[str, str], new_tags: Dict[str, str], audio=None):
+        """写入WAV文件标签"""
+        if audio is None:
+            audio = WAVE(file_path)
 
-    def _write_dsf_tags(self, file_path: str, original_tags: Dict[str, str], new_tags: Dict[str, str]):
-        """写入DSF文件标签"""
+        if audio.tags is None:
+            # 如果没有标签，尝试添加
+            pass
+        else:
+            for field, value in changed_tags.items():
+                if value:
+                    audio[field] = [value]
+                elif field in audio:
+                    del audio[field]
+
+        audio.save()
+
+    def _write_other_tags(self, file_path: str, changed_tags: Dict[str, str], new_tags: Dict[str, str], audio=None):
+        """写入其他格式文件标签"""
+        if audio is None:
+            audio = mutagen.File(file_path, easy=True)
+        if audio:
+            for field, value in changed_tags.items():
+                if value:
+                    audio[field.lower()] = value
+                elif field.lower() in audio:
+                    del audio[field.lower()]
+
+            audio.save()
+
+    def _write_dsf_tags(self, file_path: str, changed_tags: Dict[str, str], new_tags: Dict[str, str], audio=None):
+        """写入DSF文件标签（beets和mutagen各自打开文件，不使用audio）"""
         try:
             # 首先尝试使用beets
             try:
-                from beets.library import Library, Item
-                from beets import config
-                from beets.util import syspath
-
-                config.clear()
-                config.read(user=False)
-
+                Item, syspath = get_beets()
                 item = Item.from_path(syspath(file_path))
 
-                field_mapping = {
-                    'ARTIST': 'artist',
-                    'TITLE': 'title',
-                    'ALBUM': 'album',
-                    'GENRE': 'genre',
-                    'COMPOSER': 'composer',
-                    'PERFORMER': 'performer',
-                    'ALBUMARTIST': 'albumartist',
-                    'DATE': 'year',
-                    'TRACKNUMBER': 'track',
-                    'TRACKTOTAL': 'tracktotal',
-                    'DISCNUMBER': 'disc',
-                    'TOTALDISCS': 'disctotal',
-                    'COMMENT': 'comments'
-                }
-
-                for our_field, beets_field in field_mapping.items():
-                    if our_field in new_tags and new_tags[our_field] != original_tags.get(our_field, ""):
-                        value = new_tags[our_field]
+                for our_field, beets_field in BEETS_FIELD_MAP.items():
+                    if our_field in changed_tags:
+                        value = changed_tags[our_field]
                         if value:
                             setattr(item, beets_field, value)
                         else:
                             setattr(item, beets_field, None)
 
                 # 写入自定义字段
-                for field, value in new_tags.items():
-                    if field not in field_mapping and value != original_tags.get(field, ""):
+                for field, value in changed_tags.items():
+                    if field not in BEETS_FIELD_MAP:
                         if value:
                             # 对于自定义字段，尝试使用TXXX
                             try:
@@ -539,48 +590,31 @@ class MusicTagProcessor:
 
             # 如果beets失败，尝试使用mutagen
             try:
-                from mutagen.dsf import DSF
                 audio = DSF(file_path)
 
                 if audio.tags is None:
                     audio.add_tags()
 
-                # DSF字段映射
-                dsf_field_map = {
-                    'ARTIST': 'TPE1',
-                    'TITLE': 'TIT2',
-                    'ALBUM': 'TALB',
-                    'DATE': 'TDRC',
-                    'GENRE': 'TCON',
-                    'TRACKNUMBER': 'TRCK',
-                    'COMPOSER': 'TCOM',
-                    'PERFORMER': 'TPE2',
-                    'ALBUMARTIST': 'TPE2',
-                    'COMMENT': 'COMM',
-                    'DISCNUMBER': 'TPOS',
-                }
-
-                for field, value in new_tags.items():
-                    if value != original_tags.get(field, ""):
-                        dsf_field = dsf_field_map.get(field)
-                        if dsf_field:
-                            if value:
-                                # 特殊处理TRACKNUMBER和TRACKTOTAL
-                                if field == 'TRACKNUMBER':
-                                    tracktotal = new_tags.get('TRACKTOTAL', '')
-                                    if tracktotal:
-                                        value = f"{value}/{tracktotal}"
-                                elif field == 'TRACKTOTAL':
-                                    continue
-
-                                # 创建或更新帧
-                                frame_class = getattr(id3, dsf_field, None)
-                                if frame_class:
-                                    audio.tags.add(frame_class(encoding=3, text=value))
-                        else:
-                            # 自定义字段
-                            if value:
-                                audio.tags.add(id3.TXXX(encoding=3, desc=field, text=value))
+                for field, value in changed_tags.items():
+                    dsf_field = DSF_FIELD_MAP.get(field)
+                    if dsf_field:
+                        if value:
+                            # 特殊处理TRACKNUMBER和TRACKTOTAL
+                            if field == 'TRACKNUMBER':
+                                tracktotal = new_tags.get('TRACKTOTAL', '')
+                                if tracktotal:
+                                    value = f"{value}/{tracktotal}"
+                            elif field == 'TRACKTOTAL':
+                                continue
+
+                            # 创建或更新帧
+                            frame_class = getattr(id3, dsf_field, None)
+                            if frame_class:
+                                audio.tags.add(frame_class(encoding=3, text=value))
+                    else:
+                        # 自定义字段
+                        if value:
+                            audio.tags.add(id3.TXXX(encoding=3, desc=field, text=value))
 
                 audio.save()
 
@@ -588,4 +622,39 @@ class MusicTagProcessor:
                 print(f"mutagen写入DSF失败 {file_path}: {mutagen_error}")
 
         except Exception as e:
-            print(f"所有DSF写入方法都失败 {file_path}: {e}")
\ No newline at end of file
+            print(f"所有DSF写入方法都失败 {file_path}: {e}")
+
+
+def _open_mp3(file_path):
+    """打开MP3文件"""
+    return MP3(file_path, ID3=ID3)
+
+
+def _open_other(file_path):
+    """打开其他格式文件"""
+    return mutagen.File(file_path, easy=True)
+
+
+# 扩展名 -> 打开文件的函数，None表示该格式读写时各自打开文件
+FILE_AUDIO_OPENERS = {
+    '.flac': FLAC,
+    '.mp3': _open_mp3,
+    '.wav': WAVE,
+    '.dsf': None,
+}
+
+# 扩展名 -> 标签读取方法，未列出的格式使用 _read_other_tags
+FILE_TAG_READERS = {
+    '.flac': MusicTagProcessor._read_flac_tags,
+    '.mp3': MusicTagProcessor._read_mp3_tags,
+    '.wav': MusicTagProcessor._read_wav_tags,
+    '.dsf': MusicTagProcessor._read_dsf_tags,
+}
+
+# 扩展名 -> 标签写入方法，未列出的格式使用 _write_other_tags
+FILE_TAG_WRITERS = {
+    '.flac': MusicTagProcessor._write_flac_tags,
+    '.mp3': MusicTagProcessor._write_mp3_tags,
+    '.wav': MusicTagProcessor._write_wav_tags,
+    '.dsf': MusicTagProcessor._write_dsf_tags,
+}
@@ -0,0 +1,81 @@
+import os
+import sys
+import shutil
+import struct
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mutagen.dsf import DSF
+
+import main
+
+
+def make_dsf(path):
+    """生成只包含静音DSD数据、没有标签的DSF文件"""
+    data = b'\x69' * 4096 * 2
+    fmt = b'fmt ' + struct.pack('<QIIIIIIQII', 52, 1, 0, 2, 2, 2822400, 1, 4096, 4096, 0)
+    dat = b'data' + struct.pack('<Q', 12 + len(data)) + data
+    dsd = b'DSD ' + struct.pack('<QQQ', 28, 28 + len(fmt) + len(dat), 0)
+    with open(path, 'wb') as f:
+        f.write(dsd + fmt + dat)
+
+
+class DsfCommentTest(unittest.TestCase):
+    """DSF注释字段 (COMM) 的写入"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'a.dsf')
+        make_dsf(self.path)
+        self.processor = main.MusicTagProcessor()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def comments(self):
+        tags = DSF(self.path).tags
+        return [frame.text for frame in tags.getall('COMM')] if tags else []
+
+    def test_clear_comment(self):
+        self.processor.write_file_tags(self.path, {}, {'COMMENT': 'first'})
+        self.assertEqual(self.comments(), [['first']])
+
+        # 修改注释时替换原有的帧，不会重复
+        self.processor.write_file_tags(self.path, {'COMMENT': 'first'}, {'COMMENT': 'second'})
+        self.assertEqual(self.comments(), [['second']])
+
+        self.processor.write_file_tags(self.path, {'COMMENT': 'second'}, {'COMMENT': ''})
+        self.assertEqual(self.comments(), [])
+
+
+class DsfNumberTest(unittest.TestCase):
+    """DSF音轨号和碟号的写入"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'a.dsf')
+        make_dsf(self.path)
+        self.processor = main.MusicTagProcessor()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def frame_text(self, frame_id):
+        return [str(frame) for frame in DSF(self.path).tags.getall(frame_id)]
+
+    def test_disc_number_keeps_total(self):
+        original = {'DISCNUMBER': '2', 'TOTALDISCS': '3'}
+        self.processor.write_file_tags(self.path, original, dict(original, DISCNUMBER='5'))
+        self.assertEqual(self.frame_text('TPOS'), ['5/3'])
+
+    def test_zero_track_total_is_skipped(self):
+        # beets没有总数时读出的TRACKTOTAL为"0"
+        original = {'TRACKNUMBER': '1', 'TRACKTOTAL': '0'}
+        self.processor.write_file_tags(self.path, original, dict(original, TRACKNUMBER='3'))
+        self.assertEqual(self.frame_text('TRCK'), ['3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mutagen.id3 import ID3, TXXX
+
+import main
+
+
+def make_mp3(path):
+    """生成只包含静音MPEG帧、没有标签的MP3文件"""
+    frame = b'\xff\xfb\x90\x64' + b'\x00' * 413
+    with open(path, 'wb') as f:
+        f.write(frame * 40)
+
+
+class Mp3CustomFieldTest(unittest.TestCase):
+    """MP3自定义字段 (TXXX) 的写入"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'a.mp3')
+        make_mp3(self.path)
+        id3_tags = ID3()
+        id3_tags.add(TXXX(encoding=3, desc='mood', text='calm'))
+        id3_tags.save(self.path)
+        self.processor = main.MusicTagProcessor()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def custom_frames(self):
+        return [(frame.desc, frame.text) for frame in ID3(self.path).getall('TXXX')]
+
+    def test_edit_lowercase_description(self):
+        original = self.processor.read_file_tags(self.path)
+        self.assertEqual(original['MOOD'], 'calm')
+
+        # 修改后只保留一个MOOD帧
+        self.processor.write_file_tags(self.path, original, dict(original, MOOD='happy'))
+        self.assertEqual(self.custom_frames(), [('MOOD', ['happy'])])
+
+    def test_clear_lowercase_description(self):
+        original = self.processor.read_file_tags(self.path)
+        self.processor.write_file_tags(self.path, original, dict(original, MOOD=''))
+        self.assertEqual(self.custom_frames(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
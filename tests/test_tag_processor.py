@@ -0,0 +1,85 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mutagen.id3 import ID3, TXXX, COMM, TSSE
+
+import tag_processor
+
+
+def make_mp3(path):
+    """生成只包含静音MPEG帧、没有标签的MP3文件"""
+    frame = b'\xff\xfb\x90\x64' + b'\x00' * 413
+    with open(path, 'wb') as f:
+        f.write(frame * 40)
+
+
+class Mp3CustomFieldTest(unittest.TestCase):
+    """MP3自定义字段 (TXXX) 的写入"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'a.mp3')
+        make_mp3(self.path)
+        self.processor = tag_processor.MusicTagProcessor()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_clear_custom_field_keeps_other_changes(self):
+        self.processor.write_file_tags(self.path, {}, {'TITLE': 'Old', 'MOOD': 'calm'})
+        original = self.processor.read_file_tags(self.path)
+        self.assertEqual(original['MOOD'], 'calm')
+
+        # 同一次写入中清除自定义字段并修改标题
+        new_tags = dict(original, MOOD='', TITLE='New')
+        self.processor.write_file_tags(self.path, original, new_tags)
+
+        tags = self.processor.read_file_tags(self.path)
+        self.assertEqual(tags['TITLE'], 'New')
+        self.assertNotIn('MOOD', tags)
+        self.assertEqual(ID3(self.path).getall('TXXX'), [])
+
+    def test_custom_field_description_is_case_insensitive(self):
+        id3_tags = ID3()
+        id3_tags.add(TXXX(encoding=3, desc='mood', text='calm'))
+        id3_tags.save(self.path)
+
+        original = self.processor.read_file_tags(self.path)
+        self.assertEqual(original['MOOD'], 'calm')
+
+        # 修改后只保留一个MOOD帧
+        self.processor.write_file_tags(self.path, original, dict(original, MOOD='happy'))
+        frames = ID3(self.path).getall('TXXX')
+        self.assertEqual([(frame.desc, frame.text) for frame in frames], [('MOOD', ['happy'])])
+
+
+class Mp3ReadTest(unittest.TestCase):
+    """MP3标签的读取"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'a.mp3')
+        make_mp3(self.path)
+        self.processor = tag_processor.MusicTagProcessor()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_reads_comment_and_skips_unmapped_frames(self):
+        id3_tags = ID3()
+        id3_tags.add(COMM(encoding=3, lang='eng', desc='', text='hello'))
+        id3_tags.add(TSSE(encoding=3, text='LAME'))
+        id3_tags.save(self.path)
+
+        tags = self.processor.read_file_tags(self.path)
+        self.assertEqual(tags['COMMENT'], 'hello')
+        self.assertNotIn('TSSE', tags)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,20 +1,119 @@
 import os
 import re
+import threading
+from functools import lru_cache
 from typing import List, Set
 
 
-def get_audio_files_from_directory(directory: str, supported_formats: Set[str]) -> List[str]:
-    """从目录获取所有音频文件"""
-    audio_files = []
+# 空白字符正则（修剪重复空格用）
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=64)
+def get_brackets_pattern(brackets: tuple):
+    """获取删除一组括号及内容的正则，各括号对用|合并为一个正则，按括号组合缓存"""
+    if not brackets:
+        return None
+    return re.compile('|'.join(re.escape(b[0]) + '.*?' + re.escape(b[1]) for b in brackets))
+
+
+def compile_bracket_pattern(brackets: List[str]):
+    """编译一组括号对应的正则，忽略不是两个字符的括号，没有括号时返回None"""
+    return get_brackets_pattern(tuple(b for b in brackets if len(b) == 2))
+
+
+# 中英文标点转换表
+CHINESE_PUNCTUATION = '，。！？；："‘’""（）【】《》'
+ENGLISH_PUNCTUATION = ',.!?;:\'""""()[]<>'
+CN_TO_EN_TABLE = str.maketrans(CHINESE_PUNCTUATION, ENGLISH_PUNCTUATION)
+EN_TO_CN_TABLE = str.maketrans(ENGLISH_PUNCTUATION, CHINESE_PUNCTUATION)
+# 转换方向 -> 转换表
+PUNCTUATION_TABLES = {
+    "中文转英文": CN_TO_EN_TABLE,
+    "英文转中文": EN_TO_CN_TABLE,
+}
+
 
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            ext = os.path.splitext(file)[1].lower()
-            if ext in supported_formats:
-                file_path = os.path.join(root, file)
-                audio_files.append(file_path)
+# MP3字段映射（字段 -> ID3帧），没有列出的字段按自定义字段写入TXXX
+MP3_FIELD_MAP = {
+    'TITLE': 'TIT2',
+    'ARTIST': 'TPE1',
+    'ALBUM': 'TALB',
+    'DATE': 'TDRC',
+    'GENRE': 'TCON',
+    'TRACKNUMBER': 'TRCK',
+    'COMPOSER': 'TCOM',
+    'PERFORMER': 'TPE2',
+    'ALBUMARTIST': 'TPE2',
+    'COMMENT': 'COMM',
+    'DISCNUMBER': 'TPOS',
+}
+# ID3帧 -> 字段，读取时使用；TPE2按专辑艺术家读取
+MP3_FIELD_MAP_INV = {frame_id: field for field, frame_id in MP3_FIELD_MAP.items()}
 
-    return audio_files
+
+# beets使用全局配置，初始化时需要串行化
+BEETS_LOCK = threading.Lock()
+_beets_library = None
+_beets_api = None
+
+
+@lru_cache(maxsize=1)
+def beets_available():
+    """检查beets是否可用，只尝试导入一次"""
+    try:
+        import beets.library  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_beets():
+    """导入beets并初始化配置和内存库，只在第一次调用时执行，返回(Item, syspath)"""
+    global _beets_library, _beets_api
+    if _beets_api is None:
+        if not beets_available():
+            raise ImportError("beets未安装")
+        with BEETS_LOCK:
+            if _beets_api is None:
+                from beets.library import Library, Item
+                from beets.util import syspath
+                from beets import config
+
+                config.clear()
+                config.read(user=False)
+                _beets_library = Library(':memory:')
+                _beets_api = (Item, syspath)
+    return _beets_api
+
+
+def iter_file_entries(directory: str):
+    """递归遍历目录，逐个返回非目录条目（os.DirEntry），顺序与os.walk相同"""
+    # 用栈代替递归，scandir返回的条目自带类型信息，不需要额外stat
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            continue
+
+        sub_dirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                sub_dirs.append(entry.path)
+            else:
+                yield entry
+
+        # 倒序入栈，保持和os.walk相同的遍历顺序
+        stack.extend(reversed(sub_dirs))
+
+
+def get_audio_files_from_directory(directory: str, supported_formats: Set[str]) -> List[str]:
+    """从目录获取所有音频文件"""
+    return [entry.path for entry in iter_file_entries(directory)
+            if os.path.splitext(entry.name)[1].lower() in supported_formats]
 
 
 def is_audio_file(filename: str, supported_formats: Set[str]) -> bool:
@@ -32,42 +131,33 @@ def normalize_field_name(field_name: str) -> str:
 def parse_range(range_str: str) -> tuple:
     """解析范围字符串，如 '1-4'"""
     try:
-        if '-' in range_str:
-            start, end = range_str.split('-')
-            return int(start.strip()), int(end.strip())
-        else:
-            pos = int(range_str.strip())
-            return pos, pos
+        # partition只扫描一遍字符串，int()本身会忽略两端空白
+        start, sep, end = range_str.partition('-')
+        if sep:
+            return int(start), int(end)
+        pos = int(start)
+        return pos, pos
     except:
         return 1, 1
 
 
 def remove_brackets_content(text: str, brackets: List[str]) -> str:
     """移除括号及内容"""
-    result = text
-    for bracket_pair in brackets:
-        if len(bracket_pair) == 2:
-            open_bracket, close_bracket = bracket_pair[0], bracket_pair[1]
-            # 使用正则表达式删除括号及内容
-            pattern = re.escape(open_bracket) + '.*?' + re.escape(close_bracket)
-            result = re.sub(pattern, '', result)
-    return result
+    # 所有括号对合并为一个正则，只扫描一遍
+    pattern = compile_bracket_pattern(brackets)
+    if pattern is None:
+        return text
+    return pattern.sub('', text)
 
 
 def convert_punctuation(text: str, to_english: bool = True) -> str:
     """转换标点符号"""
     if to_english:
         # 中文标点转英文标点
-        chinese_punctuation = '，。！？；："‘’""（）【】《》'
-        english_punctuation = ',.!?;:\'""""()[]<>'
-        trans_table = str.maketrans(chinese_punctuation, english_punctuation)
-        return text.translate(trans_table)
+        return text.translate(CN_TO_EN_TABLE)
     else:
         # 英文标点转中文标点
-        english_punctuation = ',.!?;:\'""""()[]<>'
-        chinese_punctuation = '，。！？；："‘’""（）【】《》'
-        trans_table = str.maketrans(english_punctuation, chinese_punctuation)
-        return text.translate(trans_table)
+        return text.translate(EN_TO_CN_TABLE)
 
 
 def trim_spaces(text: str, trim_type: str = "all") -> str:
@@ -78,6 +168,6 @@ def trim_spaces(text: str, trim_type: str = "all") -> str:
         result = result.strip()
 
     if trim_type in ["duplicate", "all"]:
-        result = re.sub(r'\s+', ' ', result)
+        result = WHITESPACE_PATTERN.sub(' ', result)
 
     return result
\ No newline at end of file